@@ -1,14 +1,58 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import pandas as pd
 import numpy as np
-import joblib
 import json
 import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+from batch import Accounts, BatchPool
+from feature_encoder import FeatureEncoder
+from forest_engine import CompiledForest
+from imputation import ImputationTable
+from jobs import JobQueue, QueueFull
+from metrics import (CONTENT_TYPE, registry, request_bytes, requests_in_flight,
+                     rows_processed, stage_seconds)
+from model_store import ModelBundle, ModelStore
+from prediction_cache import PredictionCache
+from pricing import FALLBACK_SAVINGS_RATE, PricingStore
+from upload_reader import (COMPRESSED_CSV_FORMATS, detect_format, estimate_rows, frame_bytes_per_row,
+                           input_columns, read_upload)
+from upload_spool import MAX_UPLOAD_MB, SpoolingRequest, mapped, reject_oversized, upload_path
+from result_cache import ResultCache, content_key, payload_key
+from top_rows import TopRows
+from trend_index import TrendIndex
+from usage_store import UsageStore
+import terraform_renderer
 
 app = Flask(__name__)
+# Uploads are written to temp files as they arrive, never buffered in memory
+app.request_class = SpoolingRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
 CORS(app, origins=os.environ.get('CORS_ORIGINS', '*').split(','))
 
+@app.before_request
+def before_request():
+    requests_in_flight.inc()
+    if request.content_length:
+        request_bytes.observe(request.content_length)
+    error = reject_oversized(request)
+    if error:
+        return jsonify({"error": error}), 413
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({"error": f"Upload exceeds the {MAX_UPLOAD_MB} MB limit"}), 413
+
+@app.teardown_request
+def teardown_request(exc):
+    requests_in_flight.dec()
+
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
@@ -16,391 +60,863 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
     return response
 
-# Load trained model and encoders
-print("🔧 Loading ML model...")
-model = joblib.load('cost_optimizer_model.pkl')
-le_service = joblib.load('le_service.pkl')
-le_instance = joblib.load('le_instance.pkl')
-le_region = joblib.load('le_region.pkl')
-print("✅ Model loaded successfully!")
+# Rows per chunk when an upload is analyzed in streaming mode
+ANALYZE_CHUNK_ROWS = int(os.environ.get('ANALYZE_CHUNK_ROWS', 100000))
+
+# Estimated frame size one request may hold in memory. Larger uploads to
+# /api/analyze are processed in chunks; /api/usage/append rejects them.
+REQUEST_MEMORY_BUDGET_MB = int(os.environ.get('REQUEST_MEMORY_BUDGET_MB', 512))
+
+# Largest `top` /api/analyze accepts: rows returned per recommendation type
+ANALYZE_TOP_MAX = int(os.environ.get('ANALYZE_TOP_MAX', 1000))
+
+# Score /api/analyze uploads on the batch process pool instead of the request
+# thread. Meant for threaded workers (gunicorn --worker-class gthread), whose
+# threads then only receive uploads and send responses.
+OFFLOAD_SCORING = os.environ.get('OFFLOAD_SCORING', 'false').lower() == 'true'
+
+# Bytes per row that scoring adds on top of the parsed columns: the encoded
+# codes, Recommendation, Confidence, Savings and the pricing temporaries
+SCORING_BYTES_PER_ROW = 128
+
+REQUIRED_COLUMNS = ['Service', 'Region', 'Cost']
+
+# Scored columns kept for each row in the incremental usage store
+STORED_COLUMNS = ['Date', 'Service', 'InstanceType', 'Region', 'Cost',
+                  'CPUUtilization', 'MemoryUtilization', 'NetworkIO',
+                  'StorageUsed', 'RunningHours', 'Recommendation', 'Confidence', 'Savings']
+
+# Extra dimensions /api/analyze can break recommendations down by; Month comes from Date
+DIMENSIONS = ['Region', 'Service', 'InstanceType', 'Month']
+
+# Group key for rows missing a dimension value
+UNKNOWN_KEY = 'unknown'
+
+# Row-level export formats and their content types
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# Scored columns appended to each exported row
+SCORE_COLUMNS = ['Recommendation', 'Confidence', 'Savings']
+
+FEATURES = ['Service_Encoded', 'InstanceType_Encoded', 'Region_Encoded',
+            'Cost', 'CPUUtilization', 'MemoryUtilization',
+            'NetworkIO', 'StorageUsed', 'RunningHours']
+
+# Per-(Service, InstanceType) means written by train_model.py
+IMPUTATION_FILE = 'imputation_table.json'
+
+
+def load_legacy_model():
+    # Unshared, per-worker copy used until an artifact is published to MODEL_DIR.
+    # joblib pulls in scikit-learn, so it is only imported on this path.
+    import joblib
+
+    model = joblib.load('cost_optimizer_model.pkl')
+    return ModelBundle(
+        version='legacy',
+        forest=CompiledForest.from_sklearn(model),
+        encoder=FeatureEncoder.load('feature_encoder.json'),
+        features=FEATURES,
+        imputation=ImputationTable.load(IMPUTATION_FILE) if os.path.exists(IMPUTATION_FILE) else None,
+    )
+
+
+# The model is loaded and warmed up on a background thread, so the worker
+# answers /api/health as soon as it has imported. Requests that need the
+# model before then wait for the load; /api/ready reports when it is done.
+store = ModelStore(fallback=load_legacy_model, load=False)
+ready = threading.Event()
+startup = {'started': time.time(), 'error': None}
+
+pricing = PricingStore()
+jobs = JobQueue()
+batch_pool = BatchPool()
+results = ResultCache()
+vector_cache = PredictionCache()
+
+
+def warm_up():
+    print("🔧 Loading ML model...")
+    start = time.perf_counter()
+    try:
+        bundle = store.current()
+        # The first walk faults in the memory-mapped node arrays
+        bundle.forest.predict(np.zeros((1, len(bundle.features)), dtype=np.float32))
+        startup['seconds'] = time.perf_counter() - start
+        print(f"✅ Model {bundle.version} loaded successfully in {startup['seconds']:.2f}s!")
+        ready.set()
+    except Exception as e:
+        startup['error'] = str(e)
+        print(f"❌ Model load failed: {str(e)}")
+
+
+threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({"status": "ok", "message": "Backend is running!"})
+    # Liveness only: never waits for the model
+    return jsonify({
+        "status": "ok",
+        "message": "Backend is running!",
+        "ready": ready.is_set(),
+        "model_version": store.bundle.version if ready.is_set() else None
+    })
 
-@app.route('/api/analyze', methods=['POST'])
-def analyze_costs():
-    try:
-        # Get uploaded file
-        if 'file' not in request.files:
-            return jsonify({"error": "No file uploaded"}), 400
-        
-        file = request.files['file']
-        
-        # Read CSV
-        df = pd.read_csv(file)
-        print(f"📊 Received {len(df)} rows")
-        
-        # Required columns
-        required_cols = ['Service', 'Region', 'Cost']
-        if not all(col in df.columns for col in required_cols):
-            return jsonify({"error": f"CSV must have columns: {required_cols}"}), 400
-        
-        # Add default values for missing columns
-        if 'CPUUtilization' not in df.columns:
-            df['CPUUtilization'] = np.random.uniform(20, 80, len(df))
-        if 'MemoryUtilization' not in df.columns:
-            df['MemoryUtilization'] = np.random.uniform(20, 80, len(df))
-        if 'NetworkIO' not in df.columns:
-            df['NetworkIO'] = np.random.uniform(10, 100, len(df))
-        if 'StorageUsed' not in df.columns:
-            df['StorageUsed'] = np.random.uniform(50, 500, len(df))
-        if 'RunningHours' not in df.columns:
-            df['RunningHours'] = 730
-        if 'InstanceType' not in df.columns:
-            df['InstanceType'] = 't3.large'
-        
-        # Encode categorical variables
-        df['Service_Encoded'] = df['Service'].apply(
-            lambda x: le_service.transform([x])[0] if x in le_service.classes_ else 0
-        )
-        df['InstanceType_Encoded'] = df['InstanceType'].apply(
-            lambda x: le_instance.transform([x])[0] if x in le_instance.classes_ else 0
-        )
-        df['Region_Encoded'] = df['Region'].apply(
-            lambda x: le_region.transform([x])[0] if x in le_region.classes_ else 0
-        )
-        
-        # Prepare features
-        features = ['Service_Encoded', 'InstanceType_Encoded', 'Region_Encoded',
-                   'Cost', 'CPUUtilization', 'MemoryUtilization',
-                   'NetworkIO', 'StorageUsed', 'RunningHours']
-        
-        X = df[features]
-        
-        # Make predictions
-        predictions = model.predict(X)
-        probabilities = model.predict_proba(X)
-        
-        # Add predictions to dataframe
-        df['Recommendation'] = predictions
-        df['Confidence'] = [max(prob) * 100 for prob in probabilities]
-        
-        # Calculate savings
-        total_cost = df['Cost'].sum()
-        
-        # Group recommendations
-        rec_counts = df['Recommendation'].value_counts().to_dict()
-        
-        # Generate recommendation details
+@app.route('/api/ready', methods=['GET'])
+def readiness():
+    if ready.is_set():
+        return jsonify({
+            "status": "ready",
+            "model_version": store.bundle.version,
+            "load_seconds": round(startup['seconds'], 3)
+        })
+    if startup['error']:
+        return jsonify({"status": "failed", "error": startup['error']}), 503
+    return jsonify({
+        "status": "loading",
+        "seconds_since_start": round(time.time() - startup['started'], 3)
+    }), 503
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    return registry.render(), 200, {'Content-Type': CONTENT_TYPE}
+
+# Map recommendation types to user-friendly messages
+REC_MAP = {
+    'downsize': {
+        'type': 'Right-Size Instances',
+        'desc': '{count} oversized instances detected',
+        'action': 'Downsize to appropriate instance types',
+        'icon': 'Server'
+    },
+    'terminate': {
+        'type': 'Terminate Unused Resources',
+        'desc': '{count} barely-used resources found',
+        'action': 'Shut down or delete unused resources',
+        'icon': 'Server'
+    },
+    'reserved_instance': {
+        'type': 'Reserved Instances',
+        'desc': '{count} stable workloads on on-demand pricing',
+        'action': 'Purchase Reserved Instances',
+        'icon': 'DollarSign'
+    },
+    'move_to_glacier': {
+        'type': 'S3 Storage Optimization',
+        'desc': '{count} infrequently accessed S3 buckets',
+        'action': 'Move to Glacier storage class',
+        'icon': 'Database'
+    },
+    'intelligent_tiering': {
+        'type': 'S3 Intelligent Tiering',
+        'desc': '{count} S3 buckets with variable access',
+        'action': 'Enable Intelligent-Tiering',
+        'icon': 'Database'
+    },
+    'delete_unused': {
+        'type': 'Delete Unused Volumes',
+        'desc': '{count} unattached EBS volumes',
+        'action': 'Delete after backup verification',
+        'icon': 'HardDrive'
+    },
+    'downgrade_to_gp3': {
+        'type': 'Optimize EBS Storage',
+        'desc': '{count} expensive storage types detected',
+        'action': 'Downgrade to gp3 volumes',
+        'icon': 'HardDrive'
+    },
+    'upsize': {
+        'type': 'Upsize Instances',
+        'desc': '{count} undersized instances detected',
+        'action': 'Upgrade to higher instance types',
+        'icon': 'Server'
+    },
+    'reduce_memory': {
+        'type': 'Optimize Lambda Memory',
+        'desc': '{count} Lambda functions with excess memory',
+        'action': 'Reduce memory allocation',
+        'icon': 'Zap'
+    }
+}
+
+
+def prepare_features(df, bundle):
+    # Add default values for missing columns
+    if 'RunningHours' not in df.columns:
+        df['RunningHours'] = 730.0
+    if 'InstanceType' not in df.columns:
+        df['InstanceType'] = pd.Categorical(['t3.large']).repeat(len(df))
+
+    # Missing utilization, network and storage figures come from the model's
+    # per-(Service, InstanceType) training means, so results are reproducible
+    bundle.imputation.impute(df)
+
+    # Encode categorical variables
+    bundle.encoder.encode(df)
+
+    # The model reads float32, so fill one float32 matrix column by column
+    # rather than selecting a float64 copy of the frame first
+    X = np.empty((len(df), len(bundle.features)), dtype=np.float32)
+    for i, feature in enumerate(bundle.features):
+        X[:, i] = df[feature].to_numpy()
+    return X
+
+
+def budget_rows(columns, bundle):
+    """Rows of an upload with `columns` that fit in REQUEST_MEMORY_BUDGET_MB once scored."""
+    row_bytes = frame_bytes_per_row(columns) + 4 * len(bundle.features) + SCORING_BYTES_PER_ROW
+    return max(1, REQUEST_MEMORY_BUDGET_MB * 1024 * 1024 // row_bytes)
+
+
+def score(df, bundle, prices):
+    with stage_seconds.time('encode'):
+        X = prepare_features(df, bundle)
+
+    # Make predictions (label and confidence from one walk of the forest),
+    # scoring each distinct feature vector once
+    with stage_seconds.time('predict'):
+        predictions, confidence = vector_cache.predict(bundle, X)
+    rows_processed.inc(len(df))
+
+    # Add predictions to dataframe
+    df['Recommendation'] = predictions
+    df['Confidence'] = confidence * 100
+
+    # Per-row savings from the pricing index
+    with stage_seconds.time('price'):
+        df['Savings'] = prices.savings(df)
+    return df
+
+
+class AnalysisAggregate:
+    """Running totals behind the /api/analyze response.
+
+    Scored frames are folded in with add(), so a whole upload and the same
+    upload split into chunks produce the same response. Each add() is a single
+    grouped pass over Recommendation, Service and any requested extra
+    dimensions, and every figure in the response is a sum over that table.
+    With `top`, the costliest actionable rows per type are kept alongside,
+    and with `trends` a TrendIndex of cost and savings by Date.
+    """
+
+    def __init__(self, dimensions=(), top=None, trends=None):
+        self.dimensions = list(dimensions)
+        self.keys = ['Recommendation', 'Service'] + [d for d in self.dimensions if d != 'Service']
+        self.table = None
+        self.top = top
+        self.trends = trends
+
+    def state(self):
+        return {
+            'dimensions': self.dimensions,
+            'table': None if self.table is None else self.table.to_dict('list'),
+            'top': None if self.top is None else self.top.state(),
+            'trends': None if self.trends is None else self.trends.state(),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        aggregate = cls(state['dimensions'])
+        if state.get('top') is not None:
+            aggregate.top = TopRows.from_state(state['top'])
+        if state.get('trends') is not None:
+            aggregate.trends = TrendIndex.from_state(state['trends'])
+        if state['table'] is not None:
+            aggregate.table = pd.DataFrame(state['table'])
+            if 'savings' not in aggregate.table:
+                # Rollups saved before the pricing index used the flat rate
+                optimal = aggregate.table['Recommendation'] == 'optimal'
+                aggregate.table['savings'] = aggregate.table['cost'].where(~optimal, 0) * FALLBACK_SAVINGS_RATE
+        return aggregate
+
+    def add(self, df):
+        with stage_seconds.time('aggregate'):
+            self.fold(df)
+            if self.top is not None:
+                self.top.add(df)
+            if self.trends is not None:
+                self.trends.add(df)
+
+    def fold(self, df):
+        if 'Month' in self.keys:
+            df = df.assign(Month=pd.to_datetime(df['Date'], errors='coerce').dt.strftime('%Y-%m'))
+
+        grouped = df.groupby(self.keys, sort=False, observed=True, dropna=False).agg(
+            count=('Cost', 'size'),
+            cost=('Cost', 'sum'),
+            confidence=('Confidence', 'sum'),
+            savings=('Savings', 'sum')
+        ).reset_index()
+        for key in self.keys:
+            grouped[key] = grouped[key].astype(object).fillna(UNKNOWN_KEY)
+        self.fold_table(grouped)
+
+    def fold_table(self, grouped):
+        if self.table is not None:
+            grouped = pd.concat([self.table, grouped], ignore_index=True).groupby(
+                self.keys, sort=False, as_index=False).sum()
+        self.table = grouped
+
+    def merge(self, other):
+        """Fold in another aggregate with the same dimensions, e.g. another account's."""
+        if other.table is not None:
+            self.fold_table(other.table)
+        if self.top is not None and other.top is not None:
+            self.top.merge(other.top)
+        if self.trends is not None and other.trends is not None:
+            self.trends.merge(other.trends)
+
+    @property
+    def total_rows(self):
+        return 0 if self.table is None else int(self.table['count'].sum())
+
+    def totals_by(self, keys):
+        return self.table.groupby(keys, sort=False)[['count', 'cost', 'confidence', 'savings']].sum()
+
+    def breakdown(self, dimension):
+        rows = []
+        for (value, rec_type), row in self.totals_by([dimension, 'Recommendation']).iterrows():
+            count = int(row['count'])
+            rows.append({
+                dimension: value,
+                'recommendation': rec_type,
+                'type': REC_MAP.get(rec_type, {}).get('type', rec_type),
+                'count': count,
+                'current_cost': round(row['cost'], 2),
+                'save': round(row['savings'], 2),
+                'conf': round(row['confidence'] / count, 0)
+            })
+        return rows
+
+    def to_response(self):
+        if self.table is None:
+            rec_totals = pd.DataFrame(columns=['count', 'cost', 'confidence', 'savings'])
+            service_counts = pd.Series(dtype=int)
+            total_cost = 0.0
+        else:
+            rec_totals = self.totals_by('Recommendation')
+            known = self.table[self.table['Service'] != UNKNOWN_KEY]
+            service_counts = known.groupby('Service', sort=False)['count'].sum()
+            total_cost = self.table['cost'].sum()
+
+        # Generate recommendation details, most common types first
         recommendations = []
         rec_id = 1
-        
-        for rec_type, count in rec_counts.items():
-            if rec_type == 'optimal':
+
+        for rec_type, row in rec_totals.sort_values('count', ascending=False, kind='stable').iterrows():
+            if rec_type == 'optimal' or rec_type not in REC_MAP:
                 continue
-                
-            subset = df[df['Recommendation'] == rec_type]
-            potential_saving = subset['Cost'].sum() * 0.3  # Assume 30% savings
-            
-            # Map recommendation types to user-friendly messages
-            rec_map = {
-                'downsize': {
-                    'type': 'Right-Size Instances',
-                    'desc': f'{count} oversized instances detected',
-                    'action': 'Downsize to appropriate instance types',
-                    'icon': 'Server'
-                },
-                'terminate': {
-                    'type': 'Terminate Unused Resources',
-                    'desc': f'{count} barely-used resources found',
-                    'action': 'Shut down or delete unused resources',
-                    'icon': 'Server'
-                },
-                'reserved_instance': {
-                    'type': 'Reserved Instances',
-                    'desc': f'{count} stable workloads on on-demand pricing',
-                    'action': 'Purchase Reserved Instances',
-                    'icon': 'DollarSign'
-                },
-                'move_to_glacier': {
-                    'type': 'S3 Storage Optimization',
-                    'desc': f'{count} infrequently accessed S3 buckets',
-                    'action': 'Move to Glacier storage class',
-                    'icon': 'Database'
-                },
-                'intelligent_tiering': {
-                    'type': 'S3 Intelligent Tiering',
-                    'desc': f'{count} S3 buckets with variable access',
-                    'action': 'Enable Intelligent-Tiering',
-                    'icon': 'Database'
-                },
-                'delete_unused': {
-                    'type': 'Delete Unused Volumes',
-                    'desc': f'{count} unattached EBS volumes',
-                    'action': 'Delete after backup verification',
-                    'icon': 'HardDrive'
-                },
-                'downgrade_to_gp3': {
-                    'type': 'Optimize EBS Storage',
-                    'desc': f'{count} expensive storage types detected',
-                    'action': 'Downgrade to gp3 volumes',
-                    'icon': 'HardDrive'
-                },
-                'upsize': {
-                    'type': 'Upsize Instances',
-                    'desc': f'{count} undersized instances detected',
-                    'action': 'Upgrade to higher instance types',
-                    'icon': 'Server'
-                },
-                'reduce_memory': {
-                    'type': 'Optimize Lambda Memory',
-                    'desc': f'{count} Lambda functions with excess memory',
-                    'action': 'Reduce memory allocation',
-                    'icon': 'Zap'
-                }
-            }
-            
-            if rec_type in rec_map:
-                info = rec_map[rec_type]
-                recommendations.append({
-                    'id': rec_id,
-                    'type': info['type'],
-                    'desc': info['desc'],
-                    'action': info['action'],
-                    'icon': info['icon'],
-                    'save': round(potential_saving, 2),
-                    'conf': round(subset['Confidence'].mean(), 0),
-                    'sev': 'high' if potential_saving > total_cost * 0.1 else 'med',
-                    'count': int(count),
-                    'current_cost': round(subset['Cost'].sum(), 2)
-                })
-                rec_id += 1
-        
+
+            count = int(row['count'])
+            current_cost = row['cost']
+            potential_saving = row['savings']
+
+            info = REC_MAP[rec_type]
+            recommendations.append({
+                'id': rec_id,
+                'type': info['type'],
+                'desc': info['desc'].format(count=count),
+                'action': info['action'],
+                'icon': info['icon'],
+                'save': round(potential_saving, 2),
+                'conf': round(row['confidence'] / count, 0),
+                'sev': 'high' if potential_saving > total_cost * 0.1 else 'med',
+                'count': count,
+                'current_cost': round(current_cost, 2)
+            })
+            rec_id += 1
+
         # Sort by savings
         recommendations = sorted(recommendations, key=lambda x: x['save'], reverse=True)
-        
+
         total_savings = sum([r['save'] for r in recommendations])
-        
-        # Prepare response
+
         response = {
             'total_cost': round(total_cost, 2),
             'total_savings': round(total_savings, 2),
             'savings_percentage': round((total_savings / total_cost) * 100, 1) if total_cost > 0 else 0,
             'recommendations': recommendations,
-            'total_rows': len(df),
-            'services': df['Service'].value_counts().to_dict()
+            'total_rows': self.total_rows,
+            'services': {service: int(count) for service, count in
+                         service_counts.sort_values(ascending=False, kind='stable').items()}
         }
+        if self.dimensions:
+            response['breakdowns'] = {dim: self.breakdown(dim) for dim in self.dimensions}
+        if self.top is not None:
+            response['top_resources'] = self.top.to_response()
+        if self.trends is not None:
+            response['trends'] = self.trends.to_response()
+        return response
+
+
+class UsageAggregate(AnalysisAggregate):
+    """The usage store rollup: analysis totals plus a trend index over every stored day."""
+
+    def __init__(self, dimensions=(), top=None, trends=None):
+        super().__init__(dimensions, top, trends or TrendIndex())
+
+    def add(self, df):
+        if 'Savings' not in df.columns:
+            # Partitions stored before the pricing index used the flat rate
+            df = df.assign(Savings=df['Cost'].where(df['Recommendation'] != 'optimal', 0) * FALLBACK_SAVINGS_RATE)
+        super().add(df)
+
+
+usage = UsageStore(UsageAggregate, STORED_COLUMNS)
+
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    return jsonify({**results.stats(), 'predictions': vector_cache.stats()})
+
+@app.route('/api/analyze', methods=['POST'])
+def analyze_costs():
+    try:
+        # Get uploaded file
+        if 'file' not in request.files:
+            return jsonify({"error": "No file uploaded"}), 400
+        
+        file = request.files['file']
+        stream = request.values.get('stream', 'false').lower() == 'true'
+
+        # Optional breakdowns, e.g. dimensions=Region,Month
+        dimensions = [d for d in request.values.get('dimensions', '').split(',') if d]
+        unknown = [d for d in dimensions if d not in DIMENSIONS]
+        if unknown:
+            return jsonify({"error": f"Unknown dimensions {unknown}, expected any of {DIMENSIONS}"}), 400
+
+        # Optional top=N: the N costliest actionable rows per recommendation
+        # type, with identifier columns such as ResourceId passed through
+        try:
+            top = int(request.values.get('top', 0))
+        except ValueError:
+            return jsonify({"error": "top must be an integer"}), 400
+        if not 0 <= top <= ANALYZE_TOP_MAX:
+            return jsonify({"error": f"top must be between 0 and {ANALYZE_TOP_MAX}"}), 400
+        passthrough = [c for c in request.values.get('columns', '').split(',') if c] if top else []
+
+        # Optional trends=true: daily and monthly cost and savings by Date
+        trends = request.values.get('trends', 'false').lower() == 'true'
+        aggregate = AnalysisAggregate(dimensions, TopRows(top, passthrough) if top else None,
+                                      TrendIndex() if trends else None)
+
+        # One model version and price list for the whole request, even if a reload lands mid-way
+        bundle = store.current()
+        prices = pricing.current()
+
+        # CSV, gzip/zstd CSV, Parquet or Arrow IPC, by suffix or the format field
+        try:
+            fmt = detect_format(file.filename, request.values.get('format'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        dated = 'Month' in dimensions or trends
+        columns = input_columns(bundle.features, extra=(['Date'] if dated else []) + passthrough)
+        required = REQUIRED_COLUMNS + (['Date'] if dated else [])
+
+        # The same bytes scored by the same model and prices give the same response
+        path = upload_path(file)
+        with mapped(path) as data:
+            cache_key = content_key('analyze', bundle.version, prices.version, fmt, *dimensions,
+                                    top, *passthrough, trends, data=data)
+        cached = results.get(cache_key)
+        if cached is not None:
+            print(f"⚡ Cache hit: ${cached['total_cost']:.2f} cost, ${cached['total_savings']:.2f} savings")
+            return jsonify(cached)
+
+        # An upload whose scored frame would exceed the memory budget is
+        # processed in chunks instead, and no chunk exceeds the budget either.
+        # Compressed CSVs always are: the response is the same, and their size
+        # would otherwise cost a full decompression to learn.
+        max_rows = budget_rows(columns, bundle)
+        if not (OFFLOAD_SCORING or stream) and fmt in COMPRESSED_CSV_FORMATS:
+            stream = True
+        elif not (OFFLOAD_SCORING or stream) and estimate_rows(path, fmt, columns) > max_rows:
+            print(f"⚠️  Upload exceeds the {REQUEST_MEMORY_BUDGET_MB} MB memory budget, processing in chunks")
+            stream = True
+
+        if OFFLOAD_SCORING:
+            # This thread only waits on the pool, so it holds no CPU while the
+            # spooled upload is parsed, scored and folded in another process
+            try:
+                outcome = batch_pool.call(analyze_account, path, dimensions, fmt, top, passthrough, trends)
+            except BrokenProcessPool:
+                response = jsonify({"error": "Scoring process exited abruptly, try again shortly"})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            aggregate = AnalysisAggregate.from_state(outcome['aggregate'])
+            print(f"📊 Scored {aggregate.total_rows} rows on the pool ({fmt})")
+        elif stream:
+            # Read, score and fold the upload one chunk at a time so memory
+            # stays bounded by the chunk size rather than the upload size
+            chunks = read_upload(path, fmt, columns, chunksize=min(ANALYZE_CHUNK_ROWS, max_rows))
+            for chunk in stage_seconds.timed(chunks, 'parse'):
+                if not all(col in chunk.columns for col in required):
+                    return jsonify({"error": f"CSV must have columns: {required}"}), 400
+                aggregate.add(score(chunk, bundle, prices))
+            print(f"📊 Streamed {aggregate.total_rows} rows ({fmt})")
+        else:
+            # Read only the columns the model uses
+            start = time.perf_counter()
+            with stage_seconds.time('parse'):
+                df = read_upload(path, fmt, columns)
+            print(f"📊 Received {len(df)} rows ({fmt}, parsed in {time.perf_counter() - start:.2f}s)")
+
+            if not all(col in df.columns for col in required):
+                return jsonify({"error": f"CSV must have columns: {required}"}), 400
+
+            aggregate.add(score(df, bundle, prices))
+
+        response = aggregate.to_response()
+        results.put(cache_key, response)
         
-        print(f"✅ Analysis complete: ${total_cost:.2f} cost, ${total_savings:.2f} savings")
+        print(f"✅ Analysis complete: ${response['total_cost']:.2f} cost, ${response['total_savings']:.2f} savings")
         
-        return jsonify(response)
+        with stage_seconds.time('serialize'):
+            return jsonify(response)
         
+    except ValueError as e:
+        # Malformed uploads, including ones rejected on the scoring pool
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def serialize_rows(df, output, header):
+    if output == 'csv':
+        return df.to_csv(index=False, header=header)
+    text = df.to_json(orient='records', lines=True)
+    return text if text.endswith('\n') else text + '\n'
+
+@app.route('/api/analyze/export', methods=['POST'])
+def export_scored_rows():
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file uploaded"}), 400
+
+        file = request.files['file']
+        output = request.values.get('output', 'csv').lower()
+        if output not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unsupported output '{output}', expected one of {list(EXPORT_FORMATS)}"}), 400
+
+        bundle = store.current()
+        prices = pricing.current()
+        try:
+            fmt = detect_format(file.filename, request.values.get('format'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Identifier columns such as ResourceId are passed through when asked for
+        passthrough = [c for c in request.values.get('columns', '').split(',') if c]
+        columns = input_columns(bundle.features, extra=['Date', *passthrough])
+        chunk_rows = min(ANALYZE_CHUNK_ROWS, budget_rows(columns, bundle))
+        chunks = read_upload(upload_path(file), fmt, columns, chunksize=chunk_rows)
+
+        # Read the first chunk before responding so bad uploads still get a 400
+        with stage_seconds.time('parse'):
+            first = next(chunks, None)
+        if first is None or not all(col in first.columns for col in REQUIRED_COLUMNS):
+            return jsonify({"error": f"CSV must have columns: {REQUIRED_COLUMNS}"}), 400
+        exported = [col for col in columns if col in first.columns] + SCORE_COLUMNS
+
+        def scored_rows():
+            header, rows = True, 0
+            chunk = first
+            while chunk is not None:
+                scored = score(chunk, bundle, prices)
+                with stage_seconds.time('serialize'):
+                    yield serialize_rows(scored[exported], output, header)
+                header = False
+                rows += len(chunk)
+                with stage_seconds.time('parse'):
+                    chunk = next(chunks, None)
+            print(f"✅ Exported {rows} scored rows ({output})")
+
+        # Each chunk is scored and sent before the next is read, so memory
+        # stays bounded by the chunk size however large the upload is
+        response = Response(stream_with_context(scored_rows()), mimetype=EXPORT_FORMATS[output])
+        response.headers['Content-Disposition'] = f'attachment; filename=infratrim-scored.{output}'
+        response.headers['X-Model-Version'] = bundle.version
+        return response
+
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/usage/append', methods=['POST'])
+def append_usage():
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file uploaded"}), 400
+
+        file = request.files['file']
+        bundle = store.current()
+        prices = pricing.current()
+        fmt = detect_format(file.filename, request.values.get('format'))
+        # Optional key=ResourceId,...: the columns that identify a row within its day
+        key = [c for c in request.values.get('key', '').split(',') if c]
+        columns = input_columns(bundle.features, extra=['Date', *key])
+
+        # Deduplication needs the whole export at once, so it has to fit the budget
+        path = upload_path(file)
+        rows = estimate_rows(path, fmt, columns)
+        if rows > budget_rows(columns, bundle):
+            return jsonify({"error": f"Upload of about {rows} rows exceeds the {REQUEST_MEMORY_BUDGET_MB} MB "
+                                     f"memory budget; append it in smaller files"}), 413
+
+        df = read_upload(path, fmt, columns)
+        print(f"📊 Received {len(df)} rows to append ({fmt})")
+
+        required = REQUIRED_COLUMNS + ['Date', *key]
+        if not all(col in df.columns for col in required):
+            return jsonify({"error": f"CSV must have columns: {required}"}), 400
+
+        appended, skipped, aggregate, meta = usage.append(df, lambda rows: score(rows, bundle, prices), key)
+
+        print(f"✅ Appended {appended} new rows, skipped {skipped} already stored")
+
+        return jsonify({
+            'appended': appended,
+            'skipped': skipped,
+            **meta,
+            **aggregate.to_response()
+        })
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/usage/summary', methods=['GET'])
+def usage_summary():
+    aggregate, meta = usage.summary()
+    return jsonify({**meta, **aggregate.to_response()})
+
+@app.route('/api/usage/trends', methods=['GET'])
+def usage_trends():
+    """Cost and savings per day or month from the stored usage's trend index.
+
+    e.g. ?granularity=month&service=EC2&region=eu-west-1&start=2024-01-01&end=2024-06-30,
+    or &by=recommendation for one series per recommendation type.
+    """
+    try:
+        aggregate, meta = usage.summary()
+        if meta['partitions'] and not aggregate.trends.rows:
+            # Rollup saved before the trend index existed: build it once from the stored rows
+            print("🔧 Rebuilding the usage rollup with a trend index")
+            aggregate, meta = usage.rebuild()
+
+        filters = {axis: request.args[axis] for axis in ('service', 'region', 'recommendation')
+                   if request.args.get(axis)}
+        granularity = request.args.get('granularity', 'month')
+        start = time.perf_counter()
+        try:
+            result = aggregate.trends.query(granularity, request.args.get('start') or None,
+                                            request.args.get('end') or None,
+                                            request.args.get('by') or None, **filters)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({
+            'granularity': granularity,
+            'filters': filters,
+            'series': result,
+            'query_us': round((time.perf_counter() - start) * 1e6, 1),
+            **meta
+        })
+
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+
+def analyze_job(path, progress):
+    """Job body for /api/jobs: stream the saved upload, reporting progress per chunk."""
+    bundle = store.current()
+    prices = pricing.current()
+    aggregate = AnalysisAggregate()
+
+    progress.update(stage='parsing', model_version=bundle.version)
+    columns = input_columns(bundle.features)
+    chunks = read_upload(path, detect_format(path), columns,
+                         chunksize=min(ANALYZE_CHUNK_ROWS, budget_rows(columns, bundle)))
+    for chunk in stage_seconds.timed(chunks, 'parse'):
+        if not all(col in chunk.columns for col in REQUIRED_COLUMNS):
+            raise ValueError(f"CSV must have columns: {REQUIRED_COLUMNS}")
+        progress.update(stage='scoring')
+        aggregate.add(score(chunk, bundle, prices))
+        progress.update(stage='parsing', rows_processed=aggregate.total_rows)
+
+    progress.update(stage='aggregating')
+    response = aggregate.to_response()
+    print(f"✅ Job complete: {aggregate.total_rows} rows, ${response['total_savings']:.2f} savings")
+    return response
+
+
+def analyze_account(path, dimensions, fmt=None, top=0, passthrough=(), trends=False):
+    """Pool body for /api/analyze/batch and offloaded /api/analyze: stream one saved upload."""
+    bundle = store.current()
+    prices = pricing.current()
+    aggregate = AnalysisAggregate(dimensions, TopRows(top, passthrough) if top else None,
+                                  TrendIndex() if trends else None)
+    dated = 'Month' in dimensions or trends
+    required = REQUIRED_COLUMNS + (['Date'] if dated else [])
+
+    columns = input_columns(bundle.features, extra=(['Date'] if dated else []) + list(passthrough))
+    chunks = read_upload(path, fmt or detect_format(path), columns,
+                         chunksize=min(ANALYZE_CHUNK_ROWS, budget_rows(columns, bundle)))
+    for chunk in stage_seconds.timed(chunks, 'parse'):
+        if not all(col in chunk.columns for col in required):
+            raise ValueError(f"CSV must have columns: {required}")
+        aggregate.add(score(chunk, bundle, prices))
+    return {'model_version': bundle.version, 'aggregate': aggregate.state()}
+
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    try:
+        uploads = request.files.getlist('files')
+        if not uploads:
+            return jsonify({"error": "No files uploaded"}), 400
+
+        dimensions = [d for d in request.values.get('dimensions', '').split(',') if d]
+        unknown = [d for d in dimensions if d not in DIMENSIONS]
+        if unknown:
+            return jsonify({"error": f"Unknown dimensions {unknown}, expected any of {DIMENSIONS}"}), 400
+
+        with tempfile.TemporaryDirectory(prefix='infratrim-batch-') as directory:
+            # One file per account, or zip archives of them
+            accounts = Accounts(directory)
+            try:
+                for upload in uploads:
+                    accounts.add_upload(upload)
+            except (ValueError, zipfile.BadZipFile) as e:
+                return jsonify({"error": str(e)}), 400
+            if not accounts.paths:
+                return jsonify({"error": "No usage files found in the upload"}), 400
+
+            print(f"📊 Batch of {len(accounts.paths)} accounts")
+            start = time.perf_counter()
+            outcomes = batch_pool.run(analyze_account, accounts, dimensions)
+
+        organization = AnalysisAggregate(dimensions)
+        results_by_account = []
+        for outcome in outcomes:
+            if 'error' in outcome:
+                results_by_account.append({'account': outcome['account'], 'error': outcome['error']})
+                continue
+            aggregate = AnalysisAggregate.from_state(outcome['result']['aggregate'])
+            organization.merge(aggregate)
+            results_by_account.append({
+                'account': outcome['account'],
+                'model_version': outcome['result']['model_version'],
+                'seconds': round(outcome['seconds'], 3),
+                **aggregate.to_response()
+            })
+
+        response = {
+            'accounts': results_by_account,
+            'organization': organization.to_response(),
+            'failed': sum(1 for r in results_by_account if 'error' in r),
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+        print(f"✅ Batch complete: {len(outcomes)} accounts, "
+              f"${response['organization']['total_savings']:.2f} savings in {response['seconds']:.2f}s")
+
+        with stage_seconds.time('serialize'):
+            return jsonify(response)
+
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file uploaded"}), 400
+
+        job_id = jobs.submit(analyze_job, request.files['file'])
+        print(f"📥 Queued analysis job {job_id}")
+
+        return jsonify({
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}',
+            'result_url': f'/api/jobs/{job_id}/result'
+        }), 202
+
+    except QueueFull as e:
+        response = jsonify({"error": f"Analysis queue is full: {str(e)}"})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify({'job_id': job_id, **status})
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    status = jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if status['state'] == 'failed':
+        return jsonify({"error": status.get('error', 'Job failed')}), 500
+    if status['state'] != 'done':
+        return jsonify({'job_id': job_id, **status}), 202
+    return jsonify(jobs.result(job_id))
+
 @app.route('/api/generate-terraform', methods=['POST'])
 def generate_terraform():
     try:
         data = request.json
         recommendations = data.get('recommendations', [])
-        
-        # Start building Terraform script
-        terraform_script = """# Auto-generated Terraform script for AWS cost optimization
-# Generated based on ML analysis
-
-terraform {
-  required_providers {
-    aws = {
-      source  = "hashicorp/aws"
-      version = "~> 5.0"
-    }
-  }
-}
+        stream = request.args.get('stream', 'false').lower() == 'true'
+        archive = request.args.get('format') == 'zip'
 
-provider "aws" {
-  region = "us-east-1"  # Update to your region
-}
+        if stream:
+            # Send each resource block as it is rendered; nothing is cached
+            # since the script is never held whole
+            chunks = stage_seconds.timed(terraform_renderer.render(recommendations), 'terraform')
+            return Response(stream_with_context(chunks), mimetype='text/plain')
 
-"""
-        
-        # Process recommendations and generate appropriate Terraform
-        for rec in recommendations:
-            rec_type = rec.get('type', '')
-            
-            if 'Right-Size' in rec_type or 'Downsize' in rec_type:
-                terraform_script += f"""
-# {rec_type}: {rec.get('desc', '')}
-# Potential savings: ${rec.get('save', 0):.2f}/month
-
-resource "aws_instance" "optimized_instance_{rec.get('id', 1)}" {{
-  ami           = "ami-0c55b159cbfafe1f0"  # Update with your AMI
-  instance_type = "t3.medium"  # Downsized from larger instance
-  
-  tags = {{
-    Name        = "optimized-instance"
-    CostCenter  = "optimized"
-    Savings     = "${rec.get('save', 0):.2f}"
-  }}
-}}
-"""
-            
-            elif 'Reserved Instance' in rec_type:
-                terraform_script += f"""
-# {rec_type}: {rec.get('desc', '')}
-# Potential savings: ${rec.get('save', 0):.2f}/month
-
-# Note: Reserved Instances should be purchased through AWS Console
-# This creates the instance that should be covered by RI
-resource "aws_instance" "reserved_instance_candidate_{rec.get('id', 1)}" {{
-  ami           = "ami-0c55b159cbfafe1f0"
-  instance_type = "t3.large"
-  
-  tags = {{
-    Name             = "ri-candidate"
-    ReservedInstance = "true"
-    Savings          = "${rec.get('save', 0):.2f}"
-  }}
-}}
-"""
-            
-            elif 'S3' in rec_type and 'Glacier' in rec_type:
-                terraform_script += f"""
-# {rec_type}: {rec.get('desc', '')}
-# Potential savings: ${rec.get('save', 0):.2f}/month
-
-resource "aws_s3_bucket" "optimized_bucket_{rec.get('id', 1)}" {{
-  bucket = "optimized-storage-bucket-{rec.get('id', 1)}"
-}}
-
-resource "aws_s3_bucket_lifecycle_configuration" "glacier_transition_{rec.get('id', 1)}" {{
-  bucket = aws_s3_bucket.optimized_bucket_{rec.get('id', 1)}.id
-
-  rule {{
-    id     = "move-to-glacier"
-    status = "Enabled"
-
-    transition {{
-      days          = 30
-      storage_class = "GLACIER"
-    }}
-
-    transition {{
-      days          = 90
-      storage_class = "DEEP_ARCHIVE"
-    }}
-  }}
-}}
-"""
-            
-            elif 'Intelligent' in rec_type and 'Tiering' in rec_type:
-                terraform_script += f"""
-# {rec_type}: {rec.get('desc', '')}
-# Potential savings: ${rec.get('save', 0):.2f}/month
-
-resource "aws_s3_bucket" "intelligent_tiering_bucket_{rec.get('id', 1)}" {{
-  bucket = "intelligent-tiering-bucket-{rec.get('id', 1)}"
-}}
-
-resource "aws_s3_bucket_intelligent_tiering_configuration" "entire_bucket_{rec.get('id', 1)}" {{
-  bucket = aws_s3_bucket.intelligent_tiering_bucket_{rec.get('id', 1)}.id
-  name   = "EntireBucket"
-
-  tiering {{
-    access_tier = "DEEP_ARCHIVE_ACCESS"
-    days        = 180
-  }}
-
-  tiering {{
-    access_tier = "ARCHIVE_ACCESS"
-    days        = 90
-  }}
-}}
-"""
-            
-            elif 'EBS' in rec_type or 'gp3' in rec_type:
-                terraform_script += f"""
-# {rec_type}: {rec.get('desc', '')}
-# Potential savings: ${rec.get('save', 0):.2f}/month
-
-resource "aws_ebs_volume" "optimized_volume_{rec.get('id', 1)}" {{
-  availability_zone = "us-east-1a"
-  size              = 100
-  type              = "gp3"  # Optimized from gp2 or io1/io2
-  
-  tags = {{
-    Name    = "optimized-volume"
-    Savings = "${rec.get('save', 0):.2f}"
-  }}
-}}
-"""
-            
-            elif 'Lambda' in rec_type:
-                terraform_script += f"""
-# {rec_type}: {rec.get('desc', '')}
-# Potential savings: ${rec.get('save', 0):.2f}/month
-
-resource "aws_lambda_function" "optimized_function_{rec.get('id', 1)}" {{
-  filename      = "lambda_function.zip"
-  function_name = "optimized-lambda-{rec.get('id', 1)}"
-  role          = aws_iam_role.lambda_role_{rec.get('id', 1)}.arn
-  handler       = "index.handler"
-  runtime       = "python3.11"
-  
-  memory_size = 512  # Optimized from higher value
-  timeout     = 30
-  
-  tags = {{
-    Optimized = "true"
-    Savings   = "${rec.get('save', 0):.2f}"
-  }}
-}}
-
-resource "aws_iam_role" "lambda_role_{rec.get('id', 1)}" {{
-  name = "optimized-lambda-role-{rec.get('id', 1)}"
-
-  assume_role_policy = jsonencode({{
-    Version = "2012-10-17"
-    Statement = [{{
-      Action = "sts:AssumeRole"
-      Effect = "Allow"
-      Principal = {{
-        Service = "lambda.amazonaws.com"
-      }}
-    }}]
-  }})
-}}
-"""
-            
-            elif 'Terminate' in rec_type or 'Unused' in rec_type or 'Delete' in rec_type:
-                terraform_script += f"""
-# {rec_type}: {rec.get('desc', '')}
-# Potential savings: ${rec.get('save', 0):.2f}/month
-# Action: These resources should be terminated/deleted manually after verification
-# Resource count: {rec.get('count', 0)}
-
-"""
-        
-        # Add summary comment
-        total_savings = sum([rec.get('save', 0) for rec in recommendations])
-        terraform_script += f"""
-# ==========================================
-# OPTIMIZATION SUMMARY
-# ==========================================
-# Total monthly savings: ${total_savings:.2f}
-# Total annual savings: ${total_savings * 12:.2f}
-# Number of optimizations: {len(recommendations)}
-# ==========================================
-"""
-        
-        print(f"✅ Terraform generated: ${total_savings:.2f} savings, {len(recommendations)} optimizations")
-        
-        return jsonify({
+        if archive:
+            # Multi-file module: providers.tf, one file per optimization category, summary.tf
+            module = tempfile.SpooledTemporaryFile(terraform_renderer.SPOOL_BYTES)
+            with stage_seconds.time('terraform'):
+                totals = terraform_renderer.render_module(recommendations, module)
+            module.seek(0)
+            print(f"✅ Terraform module generated: ${totals.savings:.2f} savings, {totals.count} optimizations")
+            return send_file(module, mimetype='application/zip', as_attachment=True,
+                             download_name='infratrim-terraform.zip')
+
+        cache_key = payload_key('terraform', recommendations)
+        cached = results.get(cache_key)
+        if cached is not None:
+            print(f"⚡ Cache hit: Terraform for {cached['optimization_count']} optimizations")
+            return jsonify(cached)
+
+        totals = terraform_renderer.Totals()
+        with stage_seconds.time('terraform'):
+            terraform_script = ''.join(terraform_renderer.render(recommendations, totals))
+
+        print(f"✅ Terraform generated: ${totals.savings:.2f} savings, {totals.count} optimizations")
+
+        response = {
             'terraform_script': terraform_script,
-            'total_savings': round(total_savings, 2),
-            'optimization_count': len(recommendations)
-        })
+            'total_savings': round(totals.savings, 2),
+            'optimization_count': totals.count
+        }
+        results.put(cache_key, response)
+
+        with stage_seconds.time('serialize'):
+            return jsonify(response)
         
     except Exception as e:
         print(f"❌ Error generating Terraform: {str(e)}")
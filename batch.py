@@ -0,0 +1,192 @@
+"""Scores many linked-account uploads in parallel on a process pool.
+
+A batch is a set of uploads, one per account, or zip archives of them. Each
+upload is saved to a temporary directory and scored in its own pool process.
+Archives are checked against ZIP_MAX_MEMBERS and MAX_EXTRACTED_MB from their
+directory before anything is extracted.
+Wall time then grows with accounts / BATCH_POOL_WORKERS rather than with the
+account count. With OFFLOAD_SCORING the same pool also scores single
+/api/analyze uploads, keeping CPU work off the request threads.
+"""
+import multiprocessing
+import os
+import pathlib
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from upload_reader import FORMAT_SUFFIXES
+
+# Processes per gunicorn worker that score batch accounts
+BATCH_POOL_WORKERS = int(os.environ.get('BATCH_POOL_WORKERS', os.cpu_count() or 1))
+
+# Accounts accepted in one batch request
+BATCH_MAX_ACCOUNTS = int(os.environ.get('BATCH_MAX_ACCOUNTS', 200))
+
+# Uncompressed MB that zip archives in one batch may expand to
+MAX_EXTRACTED_MB = int(os.environ.get('MAX_EXTRACTED_MB', 4096))
+
+# Entries accepted in one zip archive, usage files or not
+ZIP_MAX_MEMBERS = int(os.environ.get('ZIP_MAX_MEMBERS', 1000))
+
+# Pool processes are started by a clean fork server rather than forked from a
+# serving worker whose other threads may hold locks at the time
+POOL_CONTEXT = multiprocessing.get_context('forkserver')
+
+
+def account_name(filename):
+    """Account name from an upload filename: its base name without format suffixes."""
+    name = pathlib.PurePath(filename or 'account').name
+    lower = name.lower()
+    for suffix, _ in FORMAT_SUFFIXES:
+        if lower.endswith(suffix):
+            return name[:-len(suffix)] or 'account'
+    return name
+
+
+def is_usage_file(filename):
+    name = pathlib.PurePath(filename).name.lower()
+    return not name.startswith('.') and any(name.endswith(suffix) for suffix, _ in FORMAT_SUFFIXES)
+
+
+class Accounts:
+    """Maps account names to saved upload paths, keeping names unique."""
+
+    def __init__(self, directory, limit=BATCH_MAX_ACCOUNTS, max_extracted_mb=MAX_EXTRACTED_MB):
+        self.directory = directory
+        self.limit = limit
+        self.max_extracted_mb = max_extracted_mb
+        self.extracted = 0
+        self.paths = {}
+
+    def reserve(self, filename):
+        if len(self.paths) >= self.limit:
+            raise ValueError(f"Batch has more than {self.limit} accounts")
+        base = account_name(filename)
+        name, n = base, 1
+        while name in self.paths:
+            n += 1
+            name = f'{base}-{n}'
+        # The original suffix keeps the format detectable from the path
+        suffixes = ''.join(pathlib.PurePath(filename).suffixes[-2:])
+        path = os.path.join(self.directory, f'{len(self.paths)}{suffixes}')
+        self.paths[name] = path
+        return path
+
+    def add_upload(self, upload):
+        """Save a werkzeug FileStorage, expanding .zip archives into their members."""
+        if (upload.filename or '').lower().endswith('.zip'):
+            with zipfile.ZipFile(upload.stream) as archive:
+                members = archive.infolist()
+                if len(members) > ZIP_MAX_MEMBERS:
+                    raise ValueError(f"{upload.filename} has more than {ZIP_MAX_MEMBERS} entries")
+                members = [m for m in members if not m.is_dir() and is_usage_file(m.filename)]
+                # Declared sizes are enforced on read, so a bomb is refused before it expands
+                self.extracted += sum(member.file_size for member in members)
+                if self.extracted > self.max_extracted_mb * 1024 * 1024:
+                    raise ValueError(f"Zip archives expand to more than the {self.max_extracted_mb} MB limit")
+                for member in members:
+                    # Only the base name is used, so members can't escape the directory
+                    with archive.open(member) as src, open(self.reserve(member.filename), 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+        else:
+            upload.save(self.reserve(upload.filename))
+
+
+def run_account(fn, name, path, *args):
+    # Runs inside a pool process
+    start = time.perf_counter()
+    try:
+        return {'account': name, 'result': fn(path, *args), 'seconds': time.perf_counter() - start}
+    except Exception as e:
+        return {'account': name, 'error': str(e), 'seconds': time.perf_counter() - start}
+
+
+class BatchPool:
+    """A process pool that replaces itself when a child dies.
+
+    A child killed by the OOM killer or a crash breaks a ProcessPoolExecutor
+    for good. Every submit and every pending result then raises
+    BrokenProcessPool. The pool drops the broken executor, starts a new one
+    and runs the affected work again once.
+    """
+
+    def __init__(self, workers=BATCH_POOL_WORKERS):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def current(self):
+        with self.lock:
+            # Created lazily, on first use in the serving worker
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=POOL_CONTEXT)
+            return self.executor
+
+    def reset(self, executor):
+        """Drop a broken executor, unless another thread already replaced it."""
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn, *args):
+        """Queue fn(*args), on a fresh pool if the current one is already broken.
+
+        Raises BrokenProcessPool if the fresh pool is broken too.
+        """
+        for attempt in range(2):
+            executor = self.current()
+            try:
+                return executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self.reset(executor)
+                if attempt:
+                    raise
+
+    def call(self, fn, *args):
+        """fn(*args) on the pool, retried once on a fresh pool if a child dies.
+
+        Raises BrokenProcessPool if the retry's process dies too.
+        """
+        for attempt in range(2):
+            executor = self.current()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                self.reset(executor)
+                if attempt:
+                    raise
+
+    def run(self, fn, accounts, *args):
+        """Call fn(path, *args) for every account in parallel.
+
+        Returns one dict per account, in order, holding either `result` or
+        `error`, and the seconds it took.
+        """
+        outcomes = {}
+        for attempt in range(2):
+            executor = self.current()
+            broken = False
+            futures = {}
+            try:
+                for name, path in accounts.paths.items():
+                    if name not in outcomes:
+                        futures[name] = executor.submit(run_account, fn, name, path, *args)
+            except BrokenProcessPool:
+                broken = True
+            for name, future in futures.items():
+                try:
+                    outcomes[name] = future.result()
+                except BrokenProcessPool:
+                    broken = True
+            if not broken:
+                break
+            # Accounts without an outcome run again on a fresh pool
+            self.reset(executor)
+
+        return [outcomes.get(name) or {'account': name, 'error': 'Scoring process exited abruptly', 'seconds': 0.0}
+                for name in accounts.paths]
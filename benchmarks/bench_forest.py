@@ -0,0 +1,154 @@
+"""Compare CompiledForest against sklearn's predict + predict_proba.
+
+Checks that both produce the same labels and confidences on the sample
+dataset, then times each at 1, 1k, 100k and 1M rows. `loaded` is a forest
+saved and loaded back as a published artifact, which is what the backend
+serves.
+
+Last, --workers fresh processes load the same artifact and score a large
+batch at once, as gunicorn workers and pool processes do. Their resident,
+proportional (PSS) and private memory is reported for the packed walk and
+for COMPILED_FOREST_LOAD_SKLEARN, read from /proc (Linux only).
+
+    python -m benchmarks.bench_forest
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_encoder import FeatureEncoder
+from forest_engine import CompiledForest
+
+
+def load_features(data_path):
+    df = pd.read_csv(data_path)
+    FeatureEncoder.load('feature_encoder.json').encode(df)
+    with open('model_features.json') as f:
+        features = json.load(f)
+    return df[features].to_numpy(dtype=np.float64)
+
+
+def memory_mb():
+    """This process's Rss, Pss and Private memory in MB, from /proc/self/smaps_rollup."""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                fields[name] = int(rest.split()[0]) / 1024
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'private': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+
+def score_in_worker(artifact, batch_path, load_sklearn, barrier, results):
+    # Runs in a fresh process; every worker measures while all of them hold the forest
+    forest = CompiledForest.load(artifact)
+    forest.load_sklearn = load_sklearn
+    forest.predict(np.load(batch_path, mmap_mode='r'))
+    barrier.wait()
+    results.put(memory_mb())
+    barrier.wait()
+
+
+def worker_memory(artifact, batch_path, workers, load_sklearn):
+    """Mean memory of `workers` processes scoring the same artifact together."""
+    context = multiprocessing.get_context('spawn')
+    barrier, results = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=score_in_worker, args=(artifact, batch_path, load_sklearn, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    measured = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {key: sum(m[key] for m in measured) / workers for key in measured[0]}
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='cost_optimizer_model.pkl')
+    parser.add_argument('--data', default='aws_usage_data.csv')
+    parser.add_argument('--sizes', default='1,1000,100000,1000000',
+                        help='comma-separated row counts to time')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4,
+                        help='processes sharing the artifact in the memory check')
+    parser.add_argument('--memory-rows', type=int, default=100000,
+                        help='batch each process scores in the memory check')
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    start = time.perf_counter()
+    forest = CompiledForest.from_sklearn(model)
+    print(f"🔧 Compiled {len(forest.roots)} trees, {len(forest.feature)} nodes "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    X = load_features(args.data)
+    artifact = tempfile.TemporaryDirectory()
+    forest.save(artifact.name)
+    loaded = CompiledForest.load(artifact.name)
+
+    # Equivalence against sklearn. The loaded check uses a batch above
+    # max_rows, so it covers the sklearn model read back from the artifact.
+    large = np.resize(X, (max(len(X), loaded.max_rows + 1), X.shape[1]))
+    proba = forest.predict_proba(X)
+    for name, batch, (labels, confidence) in [
+        ('packed', X, (forest.classes[proba.argmax(axis=1)], proba.max(axis=1))),
+        ('loaded', large, loaded.predict(large)),
+    ]:
+        mismatched = int((labels != model.predict(batch)).sum())
+        max_error = float(np.abs(confidence - model.predict_proba(batch).max(axis=1)).max())
+        print(f"🧪 {name}, {len(batch)} rows: {mismatched} label mismatches, max confidence error {max_error:.2e}")
+        if mismatched or max_error > 1e-9:
+            print(f"❌ {name} CompiledForest does not match sklearn")
+            sys.exit(1)
+
+    # sklearn = predict + predict_proba (the old backend path),
+    # packed = NumPy walk only, dispatched = what the backend runs,
+    # loaded = what the backend runs on a published artifact
+    print(f"\n{'rows':>10} {'sklearn ms':>12} {'packed ms':>12} {'dispatched ms':>14} "
+          f"{'loaded ms':>12} {'speedup':>8}")
+    for n in [int(s) for s in args.sizes.split(',')]:
+        batch = np.resize(X, (n, X.shape[1]))
+        repeat = args.repeat if n <= 100000 else 1
+
+        sklearn_s = best_of(lambda: (model.predict(batch), model.predict_proba(batch)), repeat)
+        packed_s = best_of(lambda: forest.predict_proba(batch), repeat)
+        dispatched_s = best_of(lambda: forest.predict(batch), repeat)
+        loaded_s = best_of(lambda: loaded.predict(batch), repeat)
+        print(f"{n:>10} {sklearn_s * 1000:>12.2f} {packed_s * 1000:>12.2f} "
+              f"{dispatched_s * 1000:>14.2f} {loaded_s * 1000:>12.2f} {sklearn_s / loaded_s:>7.1f}x")
+
+    # The batch is written once and mapped by every worker, so it isn't counted as theirs
+    batch_path = os.path.join(artifact.name, 'batch.npy')
+    np.save(batch_path, np.resize(X, (args.memory_rows, X.shape[1])).astype(np.float32))
+    print(f"\n🧠 {args.workers} processes scoring {args.memory_rows} rows each from one artifact (MB per process)")
+    print(f"{'path':>16} {'rss':>10} {'pss':>10} {'private':>10}")
+    for name, load_sklearn in [('packed walk', False), ('sklearn hand-off', True)]:
+        memory = worker_memory(artifact.name, batch_path, args.workers, load_sklearn)
+        print(f"{name:>16} {memory['rss']:>10.1f} {memory['pss']:>10.1f} {memory['private']:>10.1f}")
+    artifact.cleanup()
+
+
+if __name__ == '__main__':
+    main()
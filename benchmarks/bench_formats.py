@@ -0,0 +1,91 @@
+"""Parse time and peak memory of each upload format read_upload accepts.
+
+Writes the sample dataset (tiled to --rows) as plain, gzip and zstd CSV,
+Parquet and Arrow IPC, then reads each back with the backend's column
+projection and compact dtypes in a fresh process, so peak RSS is not
+polluted by earlier runs.
+
+    python -m benchmarks.bench_formats --rows 1000000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from upload_reader import input_columns, read_upload
+
+WRITERS = {
+    'csv': lambda df, path: df.to_csv(path, index=False),
+    'csv.gz': lambda df, path: df.to_csv(path, index=False, compression='gzip'),
+    'csv.zst': lambda df, path: df.to_csv(path, index=False, compression='zstd'),
+    'parquet': lambda df, path: df.to_parquet(path, index=False),
+    'arrow': lambda df, path: df.to_feather(path),
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse(path, fmt, columns, projected):
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if projected:
+        df = read_upload(path, fmt, columns)
+    else:
+        # What analyze_costs did before: every column, default dtypes
+        df = pd.read_csv(path, compression={'csv.gz': 'gzip', 'csv.zst': 'zstd'}.get(fmt))
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': len(df),
+        'parse_s': elapsed,
+        'peak_rss_mb': peak_rss_mb() - baseline,
+        'frame_mb': df.memory_usage(deep=True).sum() / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='aws_usage_data.csv')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--features', default='model_features.json')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    sample = pd.read_csv(args.data)
+    df = sample.iloc[np.resize(np.arange(len(sample)), args.rows)].reset_index(drop=True)
+    with open(args.features) as f:
+        columns = input_columns(json.load(f))
+
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, ctx.Pool(1, maxtasksperchild=1) as pool:
+        runs = [('csv', False)] + [(fmt, True) for fmt in WRITERS]
+        for fmt, projected in runs:
+            path = os.path.join(tmp, f'usage.{fmt}')
+            if not os.path.exists(path):
+                WRITERS[fmt](df, path)
+            result = pool.apply(parse, (path, fmt, columns, projected))
+            result.update(format=fmt if projected else 'csv (all columns)',
+                          file_mb=os.path.getsize(path) / 1024 / 1024)
+            results.append(result)
+
+    print(f"\n{'format':>18} {'file MB':>9} {'parse s':>9} {'rows/s':>12} {'peak RSS MB':>12} {'frame MB':>9}")
+    for r in results:
+        print(f"{r['format']:>18} {r['file_mb']:>9.1f} {r['parse_s']:>9.2f} "
+              f"{r['rows'] / r['parse_s']:>12,.0f} {r['peak_rss_mb']:>12.1f} {r['frame_mb']:>9.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
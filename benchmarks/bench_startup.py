@@ -0,0 +1,123 @@
+"""Backend startup: import time, time to liveness, readiness and first prediction.
+
+Each run is a fresh interpreter, so nothing is warm from an earlier run:
+
+- import: `import backend` (Flask, pandas and the backend modules)
+- health: first 200 from /api/health, measured from interpreter start
+- ready: first 200 from /api/ready, i.e. the model loaded and warmed up
+- first_prediction: a 100-row /api/analyze answered, from interpreter start
+
+It also times loading the model itself, from the pickle
+(joblib + CompiledForest.from_sklearn) and from the published artifact
+(memory-mapped .npy arrays) when one exists.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import time
+
+START = time.perf_counter()
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+STEPS = ['import', 'health', 'ready', 'first_prediction']
+
+
+def child():
+    """One cold start; prints the timings as JSON."""
+    import io
+
+    timings = {}
+    start = time.perf_counter()
+    import backend
+    timings['import'] = time.perf_counter() - start
+
+    # Measure the service, not the result cache
+    from result_cache import ResultCache
+    backend.results = ResultCache(root=None, memory_entries=0)
+
+    client = backend.app.test_client()
+    client.get('/api/health')
+    timings['health'] = time.perf_counter() - START
+
+    while client.get('/api/ready').status_code != 200:
+        if backend.startup['error']:
+            raise SystemExit(f"Model failed to load: {backend.startup['error']}")
+        time.sleep(0.001)
+    timings['ready'] = time.perf_counter() - START
+
+    from generate_data import generate_chunk
+    csv = generate_chunk(100, 0).drop(columns='Recommendation').to_csv(index=False).encode()
+    response = client.post('/api/analyze', data={'file': (io.BytesIO(csv), 'usage.csv')})
+    if response.status_code != 200:
+        raise SystemExit(f"/api/analyze returned {response.status_code}: {response.get_data(as_text=True)}")
+    timings['first_prediction'] = time.perf_counter() - START
+
+    print(json.dumps(timings))
+
+
+def model_load_times():
+    """Seconds to load the model from the pickle and from the published artifact."""
+    code = '''
+import json, time
+start = time.perf_counter()
+import joblib
+from forest_engine import CompiledForest
+CompiledForest.from_sklearn(joblib.load('cost_optimizer_model.pkl'))
+print(json.dumps(time.perf_counter() - start))
+'''
+    times = {}
+    if os.path.exists('cost_optimizer_model.pkl'):
+        times['pickle'] = json.loads(subprocess.check_output([sys.executable, '-c', code]))
+
+    from model_store import MODEL_DIR
+    if os.path.exists(os.path.join(MODEL_DIR, 'CURRENT')):
+        code = '''
+import json, time
+start = time.perf_counter()
+from model_store import ModelStore
+ModelStore().current().forest.value.sum()
+print(json.dumps(time.perf_counter() - start))
+'''
+        times['artifact'] = json.loads(subprocess.check_output([sys.executable, '-c', code]))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='JSON results path')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    runs = []
+    for i in range(args.runs):
+        output = subprocess.check_output([sys.executable, '-m', 'benchmarks.bench_startup', '--child'])
+        runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+        print(f"🚀 Run {i + 1}: " + ' '.join(f"{step}={runs[-1][step] * 1000:.0f}ms" for step in STEPS))
+
+    summary = {step: statistics.median(run[step] for run in runs) for step in STEPS}
+    print(f"\n📊 Median over {len(runs)} runs:")
+    for step in STEPS:
+        print(f"   {step:>16}: {summary[step] * 1000:8.0f} ms")
+
+    loads = model_load_times()
+    for source, seconds in loads.items():
+        print(f"   model from {source:>8}: {seconds * 1000:8.0f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'runs': runs, 'median': summary, 'model_load': loads}, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+"""Synthetic usage datasets of arbitrary size for benchmarking.
+
+Files come from generate_data.py's chunked, multi-process generator, so a
+50M-row dataset never has to fit in memory. They are cached under
+benchmarks/data and reused for the same row count and seed.
+"""
+import os
+
+from generate_data import generate, write
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def dataset_path(rows, seed=0):
+    """Path of a CSV with `rows` synthetic rows, generating it on first use."""
+    path = os.path.join(DATA_DIR, f'usage_{rows}_{seed}.csv')
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        write(generate(rows, seed), path)
+    return path
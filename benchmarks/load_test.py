@@ -0,0 +1,174 @@
+"""Concurrent /api/analyze load test of the sync and threaded serving modes.
+
+Starts the backend under gunicorn in each mode, waits for /api/ready, then
+posts the same upload from 1, 10 and 100 concurrent clients and reports
+throughput and p50/p99 latency per level:
+
+- sync: 2 sync workers scoring in the request (the original setup)
+- threaded: 2 gthread workers with --threads request threads each and
+  OFFLOAD_SCORING=true, so parsing and scoring run on the batch process pool
+
+The result cache is disabled on the servers so every request is scored.
+Pass --url to test a server that is already running instead.
+
+    python -m benchmarks.load_test --rows 100000 --concurrency 1,10,100
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = {
+    'sync': {
+        'args': ['--workers', '2'],
+        'env': {'OFFLOAD_SCORING': 'false'},
+    },
+    'threaded': {
+        'args': ['--workers', '2', '--worker-class', 'gthread', '--threads', '{threads}'],
+        'env': {'OFFLOAD_SCORING': 'true'},
+    },
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, threads, pool_workers):
+    port = free_port()
+    config = MODES[mode]
+    args = [arg.format(threads=threads) for arg in config['args']]
+    env = {
+        **os.environ,
+        **config['env'],
+        'BATCH_POOL_WORKERS': str(pool_workers),
+        'CACHE_DIR': '',
+        'CACHE_MEMORY_ENTRIES': '0',
+    }
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--timeout', '600',
+         *args, 'backend:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    wait_ready(url, process)
+    return process, url
+
+
+def wait_ready(url, process=None, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f'{url}/api/ready', timeout=1):
+                return
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+    raise SystemExit(f"{url} was not ready after {timeout}s")
+
+
+def multipart(filename, content):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode() + content + \
+        f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def post(url, body, content_type):
+    request = urllib.request.Request(f'{url}/api/analyze', data=body,
+                                     headers={'Content-Type': content_type}, method='POST')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            ok = response.status == 200
+    except urllib.error.URLError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_level(url, body, content_type, concurrency, requests):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: post(url, body, content_type), range(requests)))
+    wall = time.perf_counter() - start
+    latencies = [seconds for seconds, ok in results if ok]
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for _, ok in results if not ok),
+        'wall_s': wall,
+        'throughput_rps': len(latencies) / wall,
+        'p50_s': statistics.median(latencies) if latencies else None,
+        'p99_s': percentile(latencies, 0.99) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='rows per upload')
+    parser.add_argument('--concurrency', default='1,10,100')
+    parser.add_argument('--requests', type=int, default=0,
+                        help='requests per level (default: 3x the concurrency, at least 20)')
+    parser.add_argument('--modes', default='sync,threaded')
+    parser.add_argument('--threads', type=int, default=16, help='request threads per gthread worker')
+    parser.add_argument('--pool-workers', type=int, default=os.cpu_count(),
+                        help='BATCH_POOL_WORKERS for the threaded mode')
+    parser.add_argument('--url', help='test this running server instead of starting one per mode')
+    parser.add_argument('--output', help='JSON results path')
+    args = parser.parse_args()
+
+    from benchmarks.datasets import dataset_path
+
+    with open(dataset_path(args.rows), 'rb') as f:
+        body, content_type = multipart('usage.csv', f.read())
+    levels = [int(c) for c in args.concurrency.split(',')]
+    targets = [('url', args.url)] if args.url else [(mode, None) for mode in args.modes.split(',')]
+
+    results = []
+    for mode, url in targets:
+        process = None
+        if url is None:
+            process, url = start_server(mode, args.threads, args.pool_workers)
+        try:
+            wait_ready(url)
+            print(f"\n🚦 {mode} ({url})")
+            for concurrency in levels:
+                requests = args.requests or max(3 * concurrency, 20)
+                result = {'mode': mode, 'rows': args.rows,
+                          **run_level(url, body, content_type, concurrency, requests)}
+                results.append(result)
+                p50 = f"{result['p50_s']:.2f}s" if result['p50_s'] is not None else '-'
+                p99 = f"{result['p99_s']:.2f}s" if result['p99_s'] is not None else '-'
+                print(f"   {concurrency:>4} concurrent: {result['throughput_rps']:8.2f} req/s  "
+                      f"p50 {p50:>8}  p99 {p99:>8}  errors {result['errors']}")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpus': os.cpu_count(), 'results': results}, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
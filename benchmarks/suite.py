@@ -0,0 +1,236 @@
+"""End-to-end benchmark suite for the backend and training.
+
+For each dataset size, in a fresh process:
+
+- analyze: the /api/analyze pipeline split into parse, encode, predict,
+  price, aggregate and serialize, streamed in ANALYZE_CHUNK_ROWS chunks
+- terraform: /api/generate-terraform with --recommendations entries
+- fit: RandomForestClassifier(**MODEL_PARAMS).fit for sizes up to --fit-max-rows
+
+Each result records wall time, rows/s and peak RSS. The run is written as
+JSON (default benchmarks/results/<timestamp>.json); pass --compare with an
+earlier run to flag regressions.
+
+    python -m benchmarks.suite --sizes 10000,1000000,50000000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import time
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+STAGES = ['parse', 'encode', 'predict', 'price', 'aggregate', 'serialize']
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def stage_result(seconds, rows):
+    return {'wall_s': seconds, 'rows_per_s': rows / seconds if seconds else None}
+
+
+def bench_analyze(path, rows, chunk_rows):
+    import backend
+    from upload_reader import input_columns, read_upload
+
+    bundle = backend.store.current()
+    prices = backend.pricing.current()
+    timings = dict.fromkeys(STAGES, 0.0)
+    aggregate = backend.AnalysisAggregate()
+    chunks = read_upload(path, 'csv', input_columns(bundle.features), chunksize=chunk_rows)
+
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        timings['parse'] += time.perf_counter() - start
+        if chunk is None:
+            break
+
+        start = time.perf_counter()
+        X = backend.prepare_features(chunk, bundle)
+        timings['encode'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        predictions, confidence = backend.vector_cache.predict(bundle, X)
+        chunk['Recommendation'] = predictions
+        chunk['Confidence'] = confidence * 100
+        timings['predict'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        chunk['Savings'] = prices.savings(chunk)
+        timings['price'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        aggregate.add(chunk)
+        timings['aggregate'] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = aggregate.to_response()
+    with backend.app.app_context():
+        backend.jsonify(response).get_data()
+    timings['serialize'] += time.perf_counter() - start
+
+    return {
+        'benchmark': 'analyze',
+        'rows': rows,
+        'wall_s': sum(timings.values()),
+        'rows_per_s': rows / sum(timings.values()),
+        'stages': {stage: stage_result(timings[stage], rows) for stage in STAGES},
+        'dedup_ratio': backend.vector_cache.stats()['dedup_ratio'],
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def bench_terraform(count):
+    import backend
+    from result_cache import ResultCache
+
+    # Measure rendering, not cache hits
+    backend.results = ResultCache(root=None, memory_entries=0)
+    types = [info['type'] for info in backend.REC_MAP.values()]
+    recommendations = [{
+        'id': i + 1,
+        'type': types[i % len(types)],
+        'desc': f'{i} resources',
+        'save': float(i % 1000),
+        'count': i % 50,
+    } for i in range(count)]
+
+    client = backend.app.test_client()
+    start = time.perf_counter()
+    response = client.post('/api/generate-terraform', json={'recommendations': recommendations})
+    elapsed = time.perf_counter() - start
+    return {
+        'benchmark': 'terraform',
+        'rows': count,
+        'wall_s': elapsed,
+        'rows_per_s': count / elapsed,
+        'output_bytes': len(response.get_data()),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def bench_fit(path, rows):
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+
+    from feature_encoder import FeatureEncoder
+    from train_model import FEATURES, MODEL_PARAMS
+
+    df = pd.read_csv(path)
+    FeatureEncoder.fit(df).encode(df)
+    start = time.perf_counter()
+    RandomForestClassifier(**MODEL_PARAMS).fit(df[FEATURES], df['Recommendation'])
+    elapsed = time.perf_counter() - start
+    return {
+        'benchmark': 'fit',
+        'rows': rows,
+        'wall_s': elapsed,
+        'rows_per_s': rows / elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['rows']): r for r in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\n🔍 Compared with {baseline_path} (regression = more than {threshold:.0%} slower)")
+    for r in results:
+        old = baseline.get((r['benchmark'], r['rows']))
+        if old is None:
+            continue
+        pairs = [('total', old['wall_s'], r['wall_s'])]
+        for stage, timing in r.get('stages', {}).items():
+            if stage not in old.get('stages', {}):
+                continue
+            pairs.append((stage, old['stages'][stage]['wall_s'], timing['wall_s']))
+        for name, before, after in pairs:
+            change = after / before - 1 if before else 0
+            flag = '❌' if change > threshold else '  '
+            if change > threshold:
+                regressions += 1
+            print(f"{flag} {r['benchmark']:>9} {r['rows']:>10} {name:>10} "
+                  f"{before:>9.3f}s → {after:>9.3f}s ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='comma-separated dataset row counts (up to 50000000)')
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    parser.add_argument('--recommendations', default='1000,10000',
+                        help='comma-separated recommendation counts for Terraform')
+    parser.add_argument('--fit-max-rows', type=int, default=1000000,
+                        help='skip fit benchmarks above this many rows')
+    parser.add_argument('--output', help='JSON results path')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown fraction reported as a regression')
+    args = parser.parse_args()
+
+    from benchmarks.datasets import dataset_path
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+
+    # One fresh process per measurement so peak RSS belongs to that run alone
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for rows in sizes:
+            path = dataset_path(rows)
+            result = pool.apply(bench_analyze, (path, rows, args.chunk_rows))
+            results.append(result)
+            stages = ' '.join(f"{s}={result['stages'][s]['wall_s']:.2f}s" for s in STAGES)
+            print(f"📊 analyze {rows:>10} rows: {result['rows_per_s']:>12,.0f} rows/s "
+                  f"{result['peak_rss_mb']:>8.0f} MB  {stages}")
+
+            if rows <= args.fit_max_rows:
+                result = pool.apply(bench_fit, (path, rows))
+                results.append(result)
+                print(f"🌲 fit     {rows:>10} rows: {result['wall_s']:>8.2f}s "
+                      f"{result['peak_rss_mb']:>8.0f} MB")
+
+        for count in [int(c) for c in args.recommendations.split(',')]:
+            result = pool.apply(bench_terraform, (count,))
+            results.append(result)
+            print(f"📝 terraform {count:>8} recs: {result['wall_s']:>8.3f}s "
+                  f"{result['output_bytes'] / 1024 / 1024:>8.1f} MB output")
+
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\n✅ Results written to {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
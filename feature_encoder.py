@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+ENCODER_VERSION = 1
+
+# Categorical input column -> encoded model feature
+ENCODED_COLUMNS = {
+    'Service': 'Service_Encoded',
+    'InstanceType': 'InstanceType_Encoded',
+    'Region': 'Region_Encoded',
+}
+
+# Code given to categories that were not seen at training time. 0 matches
+# the fallback the backend has always used for unknown values.
+UNKNOWN_CODE = 0
+
+
+class FeatureEncoder:
+    """Encodes Service/InstanceType/Region to the integer codes the model was trained on.
+
+    Each column gets a precomputed CategoricalDtype, so encoding a frame is one
+    vectorized lookup per column instead of a Python call per row.
+    """
+
+    def __init__(self, classes, unknown_code=UNKNOWN_CODE):
+        self.classes = {col: list(classes[col]) for col in ENCODED_COLUMNS}
+        self.unknown_code = unknown_code
+        self.dtypes = {
+            col: pd.CategoricalDtype(categories=self.classes[col])
+            for col in ENCODED_COLUMNS
+        }
+
+    @classmethod
+    def fit(cls, df, unknown_code=UNKNOWN_CODE):
+        # Sorted classes give the same codes as sklearn's LabelEncoder
+        classes = {col: sorted(df[col].dropna().unique()) for col in ENCODED_COLUMNS}
+        return cls(classes, unknown_code=unknown_code)
+
+    def codes(self, values, column):
+        codes = pd.Series(values).astype(self.dtypes[column]).cat.codes.to_numpy()
+        return np.where(codes < 0, self.unknown_code, codes)
+
+    def encode(self, df):
+        for col, encoded in ENCODED_COLUMNS.items():
+            df[encoded] = self.codes(df[col], col)
+        return df
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'version': ENCODER_VERSION,
+                'unknown_code': self.unknown_code,
+                'classes': self.classes,
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != ENCODER_VERSION:
+            raise ValueError(f"Unsupported encoder version {data.get('version')} in {path}")
+        return cls(data['classes'], unknown_code=data['unknown_code'])
@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import warnings
+
+import numpy as np
+
+# Rows evaluated together; bounds the (rows x trees) node-index scratch space
+BLOCK_ROWS = 1024
+
+# Batches larger than this go through the sklearn forest's C traversal, when
+# there is one, which overtakes the NumPy walk once per-call overhead stops dominating
+COMPILED_FOREST_MAX_ROWS = int(os.environ.get('COMPILED_FOREST_MAX_ROWS', 2000))
+
+# Whether a loaded forest reads model.joblib for batches above max_rows. sklearn
+# copies the tree arrays into its own memory, so each process then holds a
+# private copy of the forest instead of sharing the mapped node arrays.
+COMPILED_FOREST_LOAD_SKLEARN = os.environ.get('COMPILED_FOREST_LOAD_SKLEARN', 'false').lower() == 'true'
+
+# Node arrays written one .npy file each by save(), so load() can memory-map them
+NODE_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots')
+
+# The sklearn forest saved next to the node arrays, for COMPILED_FOREST_LOAD_SKLEARN
+MODEL_FILE = 'model.joblib'
+
+
+class CompiledForest:
+    """A fitted RandomForestClassifier flattened into packed NumPy node arrays.
+
+    All trees share one set of arrays, with child indices offset so that every
+    tree lives in the same index space. `children[node]` holds the (left, right)
+    pair, and leaves point back at themselves with an infinite threshold, so
+    walking a fixed `depth` steps lands every row on its leaf in each tree
+    without per-node branching. One pass yields both the label and the
+    confidence that model.predict + model.predict_proba used to compute.
+
+    When built from a model, batches above `max_rows` are handed to that
+    model's predict_proba instead (still a single walk). save() writes the
+    model next to the node arrays. A forest from load() walks the shared,
+    memory-mapped arrays for every batch, unless `load_sklearn` is set: then
+    it unpickles the model on its first large batch, into memory of its own.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, depth, classes,
+                 model=None, max_rows=COMPILED_FOREST_MAX_ROWS, model_path=None,
+                 load_sklearn=COMPILED_FOREST_LOAD_SKLEARN):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes = classes
+        self.model = model
+        self.max_rows = max_rows
+        self.model_path = model_path
+        self.load_sklearn = load_sklearn
+        self.model_lock = threading.Lock()
+
+    @classmethod
+    def from_sklearn(cls, model, max_rows=COMPILED_FOREST_MAX_ROWS):
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            node_ids = np.arange(n, dtype=np.int64)
+            is_leaf = tree.children_left < 0
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.column_stack([
+                np.where(is_leaf, node_ids, tree.children_left),
+                np.where(is_leaf, node_ids, tree.children_right),
+            ]).astype(np.int64) + offset)
+
+            # Leaf class distributions, normalized the way predict_proba does
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            values.append(value / totals)
+
+            roots.append(offset)
+            offset += n
+            depth = max(depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int64),
+            depth=depth,
+            classes=np.asarray(model.classes_),
+            model=model,
+            max_rows=max_rows,
+        )
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in NODE_ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        np.save(os.path.join(path, 'classes.npy'), self.classes.astype(str))
+        with open(os.path.join(path, 'forest.json'), 'w') as f:
+            json.dump({'depth': self.depth, 'trees': len(self.roots)}, f, indent=2)
+        if self.model is not None:
+            import joblib
+            joblib.dump(self.model, os.path.join(path, MODEL_FILE))
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a forest written by save().
+
+        With the default mmap_mode the node arrays are mapped read-only, so
+        every process that loads the same files shares one copy in the page
+        cache instead of holding its own. The sklearn model, if wanted, is
+        loaded later by sklearn_model().
+        """
+        with open(os.path.join(path, 'forest.json')) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in NODE_ARRAYS
+        }
+        model_path = os.path.join(path, MODEL_FILE)
+        return cls(
+            depth=meta['depth'],
+            classes=np.load(os.path.join(path, 'classes.npy')).astype(object),
+            model_path=model_path if os.path.exists(model_path) else None,
+            **arrays,
+        )
+
+    def sklearn_model(self):
+        """The sklearn forest for large batches; None to walk the node arrays."""
+        if self.model is None and self.load_sklearn and self.model_path is not None:
+            with self.model_lock:
+                if self.model is None:
+                    import joblib
+                    self.model = joblib.load(self.model_path)
+        return self.model
+
+    def predict_proba(self, X):
+        # sklearn evaluates trees on float32 inputs against float64 thresholds.
+        # Only one block at a time is widened, so a float32 X is never copied whole.
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity.")
+        n_rows, n_cols = X.shape
+        n_trees = len(self.roots)
+        children = self.children.ravel()
+        proba = np.empty((n_rows, self.value.shape[1]), dtype=np.float64)
+
+        for start in range(0, n_rows, BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS].astype(np.float64)
+            flat = block.ravel()
+            row_offsets = np.repeat(np.arange(len(block), dtype=np.int64) * n_cols, n_trees)
+            nodes = np.tile(self.roots, len(block))
+
+            for _ in range(self.depth):
+                go_right = flat[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+                nodes = children[2 * nodes + go_right]
+
+            proba[start:start + len(block)] = self.value[nodes.reshape(len(block), n_trees)].sum(axis=1)
+
+        proba /= n_trees
+        return proba
+
+    def predict(self, X):
+        """Return (labels, confidence) for each row of X in one forest walk."""
+        model = self.sklearn_model() if len(X) > self.max_rows else None
+        if model is not None:
+            with warnings.catch_warnings():
+                # X may be a bare array for a model fitted on a DataFrame
+                warnings.filterwarnings('ignore', message='X does not have valid feature names')
+                proba = model.predict_proba(X)
+        else:
+            proba = self.predict_proba(X)
+        best = proba.argmax(axis=1)
+        return self.classes[best], proba[np.arange(len(proba)), best]
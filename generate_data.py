@@ -1,179 +1,249 @@
-import pandas as pd
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
 import numpy as np
-from datetime import datetime, timedelta
-import random
+import pandas as pd
 
-# Set seed for reproducibility
-np.random.seed(42)
-random.seed(42)
+from pricing import COST_PER_GB, HOURLY_COST, INSTANCE_TYPES, LAMBDA_MB_COST, LAMBDA_REQUEST_COST, REGIONS
 
 # Configuration
 num_rows = 25000
 start_date = datetime(2024, 1, 1)
 
-# Define realistic options
-services = ['EC2', 'RDS', 'S3', 'Lambda', 'EBS']
-instance_types = {
-    'EC2': ['t3.micro', 't3.small', 't3.medium', 't3.large', 't3.xlarge', 't3.2xlarge', 
-            'm5.large', 'm5.xlarge', 'm5.2xlarge', 'c5.large', 'c5.xlarge'],
-    'RDS': ['db.t3.micro', 'db.t3.small', 'db.t3.medium', 'db.r5.large', 'db.r5.xlarge'],
-    'S3': ['Standard', 'Intelligent-Tiering', 'Glacier'],
-    'Lambda': ['128MB', '256MB', '512MB', '1024MB'],
-    'EBS': ['gp2', 'gp3', 'io1', 'io2']
+# Rows per independently seeded chunk. Chunks, not workers, own the random
+# streams, so output depends only on the seed and row count.
+CHUNK_ROWS = 1000000
+
+# Define realistic options, from the catalog the pricing index is built on
+services = list(INSTANCE_TYPES)
+instance_types = INSTANCE_TYPES
+regions = REGIONS
+
+
+def price(table, types):
+    keys = np.array(list(table))
+    values = np.array(list(table.values()))
+    order = np.argsort(keys)
+    return values[order][np.searchsorted(keys[order], types)]
+
+
+def generate_ec2(rng, types):
+    n = len(types)
+    # EC2 instances - some are oversized (low utilization, high cost)
+    cpu_util = rng.beta(2, 5, n) * 100  # Skewed towards lower utilization
+    memory_util = np.clip(cpu_util + rng.normal(0, 10, n), 5, 95)
+
+    # Cost based on instance type, up to 730 hours/month
+    running_hours = rng.integers(100, 731, n)
+    cost = price(HOURLY_COST, types) * running_hours
+
+    network_io = rng.gamma(2, 50, n)  # GB
+    storage_used = rng.gamma(3, 30, n)  # GB
+
+    # Determine recommendation based on utilization
+    recommendation = np.select(
+        [(cpu_util < 30) & (cost > 50), (cpu_util > 80) & (memory_util > 80), running_hours < 200],
+        ['downsize', 'upsize', 'terminate'], 'optimal')
+    return cpu_util, memory_util, cost, running_hours, network_io, storage_used, recommendation
+
+
+def generate_rds(rng, types):
+    n = len(types)
+    cpu_util = rng.beta(3, 4, n) * 100
+    memory_util = rng.beta(3, 4, n) * 100
+
+    running_hours = rng.integers(400, 731, n)
+    cost = price(HOURLY_COST, types) * running_hours
+
+    network_io = rng.gamma(1.5, 30, n)
+    storage_used = rng.gamma(5, 100, n)
+
+    recommendation = np.select(
+        [(cpu_util < 25) & (cost > 100), (running_hours > 500) & (cost > 150)],
+        ['downsize', 'reserved_instance'], 'optimal')
+    return cpu_util, memory_util, cost, running_hours, network_io, storage_used, recommendation
+
+
+def generate_s3(rng, types):
+    n = len(types)
+    storage_used = rng.gamma(4, 1000, n)  # GB
+    cost = storage_used * price(COST_PER_GB, types)
+    network_io = rng.gamma(1, 50, n)
+
+    # Access frequency (requests per month)
+    access_frequency = rng.poisson(100, n)
+
+    standard = types == 'Standard'
+    recommendation = np.select(
+        [standard & (access_frequency < 50) & (storage_used > 1000), standard & (storage_used > 5000)],
+        ['move_to_glacier', 'intelligent_tiering'], 'optimal')
+    # CPU and memory are not applicable
+    return np.zeros(n), np.zeros(n), cost, np.full(n, 730), network_io, storage_used, recommendation
+
+
+def generate_lambda(rng, types):
+    n = len(types)
+    cpu_util = rng.beta(2, 3, n) * 100
+    memory_util = rng.beta(2, 3, n) * 100
+
+    invocations = rng.poisson(10000, n)
+    memory_mb = np.char.replace(types.astype(str), 'MB', '').astype(int)
+    cost = invocations * LAMBDA_REQUEST_COST + invocations * memory_mb * LAMBDA_MB_COST
+
+    network_io = rng.gamma(0.5, 5, n)
+
+    recommendation = np.where((memory_util < 40) & (memory_mb > 512), 'reduce_memory', 'optimal')
+    return cpu_util, memory_util, cost, np.zeros(n, dtype=int), network_io, np.zeros(n), recommendation
+
+
+def generate_ebs(rng, types):
+    n = len(types)
+    storage_used = rng.gamma(3, 100, n)
+    cost = storage_used * price(COST_PER_GB, types)
+    network_io = rng.gamma(2, 20, n)
+
+    # Check if attached
+    is_attached = rng.random(n) > 0.15  # 15% unattached
+
+    recommendation = np.select(
+        [~is_attached, np.isin(types, ['io1', 'io2']) & (network_io < 50)],
+        ['delete_unused', 'downgrade_to_gp3'], 'optimal')
+    return np.zeros(n), np.zeros(n), cost, np.full(n, 730), network_io, storage_used, recommendation
+
+
+GENERATORS = {
+    'EC2': generate_ec2,
+    'RDS': generate_rds,
+    'S3': generate_s3,
+    'Lambda': generate_lambda,
+    'EBS': generate_ebs,
 }
-regions = ['us-east-1', 'us-west-2', 'eu-west-1', 'eu-central-1', 'ap-south-1', 'ap-southeast-1']
-
-# Generate data
-data = []
-
-for i in range(num_rows):
-    # Random date within last 12 months
-    date = start_date + timedelta(days=random.randint(0, 365))
-    
-    # Random service
-    service = random.choice(services)
-    instance_type = random.choice(instance_types[service])
-    region = random.choice(regions)
-    
-    # Generate realistic metrics based on service type
-    if service == 'EC2':
-        # EC2 instances - some are oversized (low utilization, high cost)
-        cpu_util = np.random.beta(2, 5) * 100  # Skewed towards lower utilization
-        memory_util = cpu_util + np.random.normal(0, 10)
-        memory_util = np.clip(memory_util, 5, 95)
-        
-        # Cost based on instance type
-        base_cost = {
-            't3.micro': 0.0104, 't3.small': 0.0208, 't3.medium': 0.0416,
-            't3.large': 0.0832, 't3.xlarge': 0.1664, 't3.2xlarge': 0.3328,
-            'm5.large': 0.096, 'm5.xlarge': 0.192, 'm5.2xlarge': 0.384,
-            'c5.large': 0.085, 'c5.xlarge': 0.17
-        }
-        hourly_cost = base_cost.get(instance_type, 0.1)
-        running_hours = random.randint(100, 730)  # Up to 730 hours/month
-        cost = hourly_cost * running_hours
-        
-        network_io = np.random.gamma(2, 50)  # GB
-        storage_used = np.random.gamma(3, 30)  # GB
-        
-        # Determine recommendation based on utilization
-        if cpu_util < 30 and cost > 50:
-            recommendation = 'downsize'
-        elif cpu_util > 80 and memory_util > 80:
-            recommendation = 'upsize'
-        elif running_hours < 200:
-            recommendation = 'terminate'
-        else:
-            recommendation = 'optimal'
-            
-    elif service == 'RDS':
-        cpu_util = np.random.beta(3, 4) * 100
-        memory_util = np.random.beta(3, 4) * 100
-        
-        base_cost = {
-            'db.t3.micro': 0.017, 'db.t3.small': 0.034, 'db.t3.medium': 0.068,
-            'db.r5.large': 0.24, 'db.r5.xlarge': 0.48
-        }
-        hourly_cost = base_cost.get(instance_type, 0.1)
-        running_hours = random.randint(400, 730)
-        cost = hourly_cost * running_hours
-        
-        network_io = np.random.gamma(1.5, 30)
-        storage_used = np.random.gamma(5, 100)
-        
-        if cpu_util < 25 and cost > 100:
-            recommendation = 'downsize'
-        elif running_hours > 500 and cost > 150:
-            recommendation = 'reserved_instance'
-        else:
-            recommendation = 'optimal'
-            
-    elif service == 'S3':
-        cpu_util = 0  # Not applicable
-        memory_util = 0
-        storage_used = np.random.gamma(4, 1000)  # GB
-        
-        cost_per_gb = {'Standard': 0.023, 'Intelligent-Tiering': 0.0125, 'Glacier': 0.004}
-        cost = storage_used * cost_per_gb.get(instance_type, 0.023)
-        
-        running_hours = 730
-        network_io = np.random.gamma(1, 50)
-        
-        # Access frequency (requests per month)
-        access_frequency = np.random.poisson(100)
-        
-        if instance_type == 'Standard' and access_frequency < 50 and storage_used > 1000:
-            recommendation = 'move_to_glacier'
-        elif instance_type == 'Standard' and storage_used > 5000:
-            recommendation = 'intelligent_tiering'
-        else:
-            recommendation = 'optimal'
-            
-    elif service == 'Lambda':
-        cpu_util = np.random.beta(2, 3) * 100
-        memory_util = np.random.beta(2, 3) * 100
-        
-        invocations = np.random.poisson(10000)
-        memory_mb = int(instance_type.replace('MB', ''))
-        cost = (invocations * 0.0000002) + (invocations * memory_mb * 0.0000000167)
-        
-        running_hours = 0
-        network_io = np.random.gamma(0.5, 5)
-        storage_used = 0
-        
-        if memory_util < 40 and memory_mb > 512:
-            recommendation = 'reduce_memory'
-        else:
-            recommendation = 'optimal'
-            
-    elif service == 'EBS':
-        cpu_util = 0
-        memory_util = 0
-        storage_used = np.random.gamma(3, 100)
-        
-        cost_per_gb = {'gp2': 0.10, 'gp3': 0.08, 'io1': 0.125, 'io2': 0.125}
-        cost = storage_used * cost_per_gb.get(instance_type, 0.1)
-        
-        running_hours = 730
-        network_io = np.random.gamma(2, 20)
-        
-        # Check if attached
-        is_attached = random.random() > 0.15  # 15% unattached
-        
-        if not is_attached:
-            recommendation = 'delete_unused'
-        elif instance_type in ['io1', 'io2'] and network_io < 50:
-            recommendation = 'downgrade_to_gp3'
-        else:
-            recommendation = 'optimal'
-    
+
+NUMERIC_COLUMNS = ['CPUUtilization', 'MemoryUtilization', 'Cost', 'RunningHours', 'NetworkIO', 'StorageUsed']
+
+
+def generate_chunk(rows, seed):
+    """One chunk of rows, with every service's block drawn in batched NumPy calls."""
+    rng = np.random.default_rng(seed)
+
+    # Random date within last 12 months, random service and region
+    days = rng.integers(0, 366, rows)
+    service = np.array(services)[rng.integers(0, len(services), rows)]
+    region = np.array(regions)[rng.integers(0, len(regions), rows)]
+
+    instance_type = np.empty(rows, dtype=object)
+    recommendation = np.empty(rows, dtype=object)
+    values = {col: np.zeros(rows) for col in NUMERIC_COLUMNS}
+
+    for name in services:
+        idx = np.flatnonzero(service == name)
+        options = np.array(instance_types[name])
+        types = options[rng.integers(0, len(options), len(idx))]
+        instance_type[idx] = types
+
+        *metrics, recommendation[idx] = GENERATORS[name](rng, types)
+        for col, metric in zip(NUMERIC_COLUMNS, metrics):
+            values[col][idx] = metric
+
     # Add some noise
-    cost = cost * np.random.uniform(0.95, 1.05)
-    
-    data.append({
-        'Date': date.strftime('%Y-%m-%d'),
+    values['Cost'] *= rng.uniform(0.95, 1.05, rows)
+
+    dates = np.datetime64(start_date.date()) + days.astype('timedelta64[D]')
+    return pd.DataFrame({
+        'Date': np.datetime_as_string(dates, unit='D'),
         'Service': service,
         'InstanceType': instance_type,
         'Region': region,
-        'Cost': round(cost, 2),
-        'CPUUtilization': round(cpu_util, 2),
-        'MemoryUtilization': round(memory_util, 2),
-        'NetworkIO': round(network_io, 2),
-        'StorageUsed': round(storage_used, 2),
-        'RunningHours': running_hours,
+        'Cost': values['Cost'].round(2),
+        'CPUUtilization': values['CPUUtilization'].round(2),
+        'MemoryUtilization': values['MemoryUtilization'].round(2),
+        'NetworkIO': values['NetworkIO'].round(2),
+        'StorageUsed': values['StorageUsed'].round(2),
+        'RunningHours': values['RunningHours'].astype(int),
         'Recommendation': recommendation
     })
 
-# Create DataFrame
-df = pd.DataFrame(data)
 
-# Save to CSV
-df.to_csv('aws_usage_data.csv', index=False)
+def generate(rows, seed=42, workers=None, chunk_rows=CHUNK_ROWS):
+    """Yield the dataset in order as DataFrames of at most chunk_rows rows.
+
+    Chunks are generated in parallel across `workers` processes, each from its
+    own child of SeedSequence(seed), so the output is the same for any worker
+    count.
+    """
+    sizes = [min(chunk_rows, rows - start) for start in range(0, rows, chunk_rows)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers == 1 or len(sizes) == 1:
+        yield from map(generate_chunk, sizes, seeds)
+        return
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep a bounded window of chunks in flight so memory doesn't grow
+        # with the row count when writing is slower than generating
+        in_flight = deque()
+        for size, chunk_seed in zip(sizes, seeds):
+            in_flight.append(pool.submit(generate_chunk, size, chunk_seed))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def write(chunks, path):
+    """Write chunks to CSV, or Parquet if path ends in .parquet; returns summary stats."""
+    stats = {'rows': 0, 'recommendations': pd.Series(dtype=int), 'cost_sum': 0.0,
+             'cost_min': np.inf, 'cost_max': -np.inf}
+    parquet = path.endswith('.parquet')
+    writer = None
+    tmp = f'{path}.tmp'
+    try:
+        for df in chunks:
+            if parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+            else:
+                df.to_csv(tmp, mode='a' if stats['rows'] else 'w', header=not stats['rows'], index=False)
+
+            stats['rows'] += len(df)
+            stats['recommendations'] = stats['recommendations'].add(
+                df['Recommendation'].value_counts(), fill_value=0)
+            stats['cost_sum'] += df['Cost'].sum()
+            stats['cost_min'] = min(stats['cost_min'], df['Cost'].min())
+            stats['cost_max'] = max(stats['cost_max'], df['Cost'].max())
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic AWS usage data.")
+    parser.add_argument('--rows', type=int, default=num_rows)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='aws_usage_data.csv',
+                        help='.csv or .parquet output path')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    stats = write(generate(args.rows, args.seed, args.workers, args.chunk_rows), args.output)
+
+    print(f"✅ Generated {stats['rows']} rows of AWS usage data")
+    print(f"\n📈 Recommendation Distribution:")
+    print(stats['recommendations'].astype(int).sort_values(ascending=False))
+    print(f"\n💰 Total Cost Range: ${stats['cost_min']:.2f} - ${stats['cost_max']:.2f}")
+    print(f"💰 Average Cost: ${stats['cost_sum'] / stats['rows']:.2f}")
+    print(f"\n✅ Saved to: {args.output}")
+
 
-print(f"✅ Generated {len(df)} rows of AWS usage data")
-print(f"📊 Columns: {list(df.columns)}")
-print(f"\n📈 Recommendation Distribution:")
-print(df['Recommendation'].value_counts())
-print(f"\n💰 Total Cost Range: ${df['Cost'].min():.2f} - ${df['Cost'].max():.2f}")
-print(f"💰 Average Cost: ${df['Cost'].mean():.2f}")
-print(f"\n✅ Saved to: aws_usage_data.csv")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
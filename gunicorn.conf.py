@@ -0,0 +1,7 @@
+"""Gunicorn settings, read from the working directory at startup."""
+from metrics import registry
+
+
+def child_exit(server, worker):
+    # Keep the worker's counters in the totals and drop its gauges
+    registry.retire(worker.pid)
@@ -0,0 +1,292 @@
+"""Parallel k-fold cross-validated grid search over Random Forest parameters.
+
+The training data is encoded once, in chunks, into a float32 feature matrix
+saved as .npy under the search directory, keyed by the data file's path,
+size and mtime:
+
+    search_cache/
+      3f2a.../
+        X.npy               <- encoded features, memory-mapped by every worker
+        y.npy               <- label codes into meta.json's classes
+        folds-k5-s42.npy    <- stratified fold id per row
+        encoder.json, imputation.json, meta.json
+        results/
+          <params digest>-<fold>.json   <- one finished fit
+
+Later searches on the same file skip the CSV load and encoding entirely.
+Each (parameters, fold) fit runs in its own pool process. The process maps
+X.npy read-only, so the OS keeps one copy of the full matrix in the page
+cache for all of them. Each fit then copies out its own training rows,
+(k-1)/k of the matrix, so peak memory grows with workers x rows. Fitting
+the full map with zero weights on the held-out fold would avoid the copy
+but not give the same trees: bootstrap draws and min_samples_* count rows,
+not weights. Every finished fit is written to results/ straight away, so an
+interrupted search picks up where it stopped.
+"""
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
+
+from feature_encoder import ENCODED_COLUMNS, FeatureEncoder
+from imputation import ImputationStats, ImputationTable
+from upload_reader import detect_format, input_columns, read_upload
+
+SEARCH_DIR = 'search_cache'
+
+DEFAULT_GRID = {
+    'n_estimators': [50, 100],
+    'max_depth': [12, 16, 20],
+    'min_samples_split': [2, 5],
+}
+
+
+def parse_value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return None if text == 'None' else text
+
+
+def parse_grid(specs):
+    """{'max_depth': [12, 20], ...} from ['max_depth=12,20', ...]."""
+    if not specs:
+        return dict(DEFAULT_GRID)
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if not name or not values:
+            raise ValueError(f"Expected name=value1,value2 in --grid, got '{spec}'")
+        grid[name] = [parse_value(v) for v in values.split(',')]
+    return grid
+
+
+def combinations(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def write_json(path, value):
+    # Write then rename, so an interrupted write never leaves a partial result
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(value, f, indent=2)
+    os.replace(tmp, path)
+
+
+class FeatureMatrix:
+    """The encoded training data on disk, with its encoder and imputation table."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.features = self.meta['features']
+        self.classes = np.array(self.meta['classes'], dtype=object)
+        self.rows = self.meta['rows']
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def X(self):
+        return np.load(self.path('X.npy'), mmap_mode='r')
+
+    def y(self):
+        return np.load(self.path('y.npy'), mmap_mode='r')
+
+    def encoder(self):
+        return FeatureEncoder.load(self.path('encoder.json'))
+
+    def imputation(self):
+        return ImputationTable.load(self.path('imputation.json'))
+
+    def folds(self, k, seed):
+        """Path of the stratified fold assignment, computed on first use."""
+        path = self.path(f'folds-k{k}-s{seed}.npy')
+        if not os.path.exists(path):
+            y = self.y()
+            folds = np.empty(len(y), dtype=np.int8)
+            splitter = StratifiedKFold(n_splits=k, shuffle=True, random_state=seed)
+            for fold, (_, test) in enumerate(splitter.split(np.zeros(len(y)), y)):
+                folds[test] = fold
+            np.save(f'{path}.tmp.npy', folds)
+            os.replace(f'{path}.tmp.npy', path)
+        return path
+
+    @classmethod
+    def build(cls, path, features, root=SEARCH_DIR, chunk_rows=500000):
+        """Encode `path` into a matrix under `root`, or reuse the one already there."""
+        stat = os.stat(path)
+        directory = os.path.join(root, digest(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, features))
+        if os.path.exists(os.path.join(directory, 'meta.json')):
+            print(f"♻️  Reusing feature matrix {directory}")
+            return cls(directory)
+
+        os.makedirs(directory, exist_ok=True)
+        columns = input_columns(features, extra=['Recommendation'])
+
+        def chunks():
+            return read_upload(path, detect_format(path), columns, chunksize=chunk_rows)
+
+        # First pass: categories, labels and the row count, so the matrix can be preallocated
+        categories = {col: set() for col in ENCODED_COLUMNS}
+        labels, rows = set(), 0
+        for chunk in chunks():
+            for col in ENCODED_COLUMNS:
+                categories[col].update(chunk[col].dropna().unique())
+            labels.update(chunk['Recommendation'].dropna().unique())
+            rows += len(chunk)
+        encoder = FeatureEncoder({col: sorted(values) for col, values in categories.items()})
+        classes = sorted(labels)
+
+        # Second pass: encode each chunk straight into the memory-mapped matrix
+        X = np.lib.format.open_memmap(os.path.join(directory, 'X.npy'), mode='w+',
+                                      dtype=np.float32, shape=(rows, len(features)))
+        y = np.lib.format.open_memmap(os.path.join(directory, 'y.npy'), mode='w+',
+                                      dtype=np.int16, shape=(rows,))
+        stats = ImputationStats(encoder.classes['Service'], encoder.classes['InstanceType'])
+        offset = 0
+        for chunk in chunks():
+            encoder.encode(chunk)
+            stats.add(chunk)
+            end = offset + len(chunk)
+            X[offset:end] = chunk[features].to_numpy(dtype=np.float32)
+            y[offset:end] = pd.Categorical(chunk['Recommendation'], categories=classes).codes
+            offset = end
+        X.flush()
+        y.flush()
+        del X, y
+
+        encoder.save(os.path.join(directory, 'encoder.json'))
+        stats.table().save(os.path.join(directory, 'imputation.json'))
+        # meta.json goes last: its presence marks a complete matrix
+        write_json(os.path.join(directory, 'meta.json'), {
+            'source': os.path.abspath(path),
+            'rows': rows,
+            'features': list(features),
+            'classes': classes,
+        })
+        print(f"✅ Encoded {rows} rows into {directory}")
+        return cls(directory)
+
+
+def fit_fold(directory, folds_path, params, fold, result_path):
+    """Fit one parameter set on all folds but `fold` and score it on `fold`.
+
+    Runs inside a pool process.
+    """
+    matrix = FeatureMatrix(directory)
+    X, y = matrix.X(), matrix.y()
+    test = np.load(folds_path, mmap_mode='r') == fold
+
+    start = time.perf_counter()
+    # A private copy of this fit's training rows, about (k-1)/k of the matrix
+    model = RandomForestClassifier(**params).fit(X[~test], y[~test])
+    fit_seconds = time.perf_counter() - start
+
+    X_test = X[test]
+    start = time.perf_counter()
+    predicted = model.predict(X_test)
+    predict_seconds = time.perf_counter() - start
+
+    result = {
+        'params': params,
+        'fold': fold,
+        'train_rows': int((~test).sum()),
+        'test_rows': len(X_test),
+        'accuracy': float((predicted == y[test]).mean()),
+        'fit_seconds': fit_seconds,
+        'predict_us_per_row': predict_seconds / max(len(X_test), 1) * 1e6,
+    }
+    write_json(result_path, result)
+    return result
+
+
+def rank(results):
+    """One entry per parameter set, most accurate first, ties broken by fit time.
+
+    `pareto` marks the sets no other set beats on both accuracy and fit time.
+    """
+    by_params = {}
+    for result in results:
+        by_params.setdefault(json.dumps(result['params'], sort_keys=True), []).append(result)
+
+    candidates = []
+    for fits in by_params.values():
+        accuracy = np.array([fit['accuracy'] for fit in fits])
+        candidates.append({
+            'params': fits[0]['params'],
+            'accuracy_mean': float(accuracy.mean()),
+            'accuracy_std': float(accuracy.std()),
+            'fit_seconds_mean': float(np.mean([fit['fit_seconds'] for fit in fits])),
+            'predict_us_per_row': float(np.mean([fit['predict_us_per_row'] for fit in fits])),
+            'folds': len(fits),
+        })
+    candidates.sort(key=lambda c: (-c['accuracy_mean'], c['fit_seconds_mean']))
+
+    fastest = float('inf')
+    for position, candidate in enumerate(candidates, 1):
+        candidate['rank'] = position
+        # Sorted by accuracy, so a set is on the frontier if it fits faster than every more accurate one
+        candidate['pareto'] = candidate['fit_seconds_mean'] < fastest
+        fastest = min(fastest, candidate['fit_seconds_mean'])
+    return candidates
+
+
+def search(matrix, base_params, grid, k=5, workers=None, seed=42):
+    """Cross-validate every combination in `grid`. Returns the report."""
+    folds_path = matrix.folds(k, seed)
+    results_dir = matrix.path('results')
+    os.makedirs(results_dir, exist_ok=True)
+
+    # One process per fit, so each fit uses a single core
+    candidates = [{**base_params, **combo, 'n_jobs': 1} for combo in combinations(grid)]
+    tasks, results = [], []
+    for params in candidates:
+        key = digest(params, k, seed)
+        for fold in range(k):
+            result_path = os.path.join(results_dir, f'{key}-{fold}.json')
+            if os.path.exists(result_path):
+                with open(result_path) as f:
+                    results.append(json.load(f))
+            else:
+                tasks.append((params, fold, result_path))
+
+    print(f"🔍 {len(candidates)} parameter sets x {k} folds: {len(results)} fits cached, {len(tasks)} to run")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fit_fold, matrix.directory, folds_path, params, fold, result_path)
+                   for params, fold, result_path in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            print(f"   [{done}/{len(tasks)}] fold {result['fold']} {result['params']}: "
+                  f"{result['accuracy'] * 100:.2f}% in {result['fit_seconds']:.1f}s")
+
+    ranked = rank(results)
+    return {
+        'rows': matrix.rows,
+        'matrix': matrix.directory,
+        'folds': k,
+        'seed': seed,
+        'workers': workers or os.cpu_count(),
+        'grid': grid,
+        'fits_run': len(tasks),
+        'fits_cached': len(results) - len(tasks),
+        'seconds': time.perf_counter() - start,
+        'best': ranked[0],
+        'ranked': ranked,
+    }
@@ -0,0 +1,161 @@
+"""Deterministic imputation of missing usage metrics, computed at training time.
+
+Training folds every chunk of data into per-(Service, InstanceType) sums and
+counts (ImputationStats) and saves the means as a small dense table next to
+the model. At serving time a missing column, or a missing value, is filled
+from that table with one array lookup per row. The same upload therefore
+always gets the same answer.
+
+The table has one extra service row and one extra instance type column for
+values not seen in training:
+
+    table[s, t]    mean for service s and instance type t
+    table[s, -1]   mean for service s over all its instance types
+    table[-1, :]   mean over all rows
+
+Combinations with no training rows take the service mean, and services with
+no rows take the overall mean.
+
+    python imputation.py     # recompute imputation_table.json from aws_usage_data.csv
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+IMPUTATION_VERSION = 1
+
+IMPUTED_COLUMNS = ['CPUUtilization', 'MemoryUtilization', 'NetworkIO', 'StorageUsed']
+
+# Used when a model was published without a table: the midpoints of the
+# uniform ranges the backend used to draw from
+DEFAULT_VALUES = {'CPUUtilization': 50.0, 'MemoryUtilization': 50.0, 'NetworkIO': 55.0, 'StorageUsed': 275.0}
+
+
+def category_codes(values, dtype):
+    # Values not in the table map to its trailing fallback slot
+    codes = pd.Series(values).astype(dtype).cat.codes.to_numpy()
+    return np.where(codes < 0, len(dtype.categories), codes)
+
+
+class ImputationTable:
+    def __init__(self, services, instance_types, columns, table):
+        self.services = list(services)
+        self.instance_types = list(instance_types)
+        self.columns = list(columns)
+        self.table = np.asarray(table, dtype=np.float64)
+        self.service_dtype = pd.CategoricalDtype(self.services)
+        self.type_dtype = pd.CategoricalDtype(self.instance_types)
+
+    @classmethod
+    def constant(cls, values=DEFAULT_VALUES):
+        columns = list(values)
+        return cls([], [], columns, np.array([[[values[col] for col in columns]]]))
+
+    def lookup(self, df):
+        """(rows x columns) imputed values for each row of df."""
+        s = category_codes(df['Service'], self.service_dtype)
+        t = category_codes(df['InstanceType'], self.type_dtype)
+        return self.table[s, t]
+
+    def impute(self, df):
+        """Fill absent columns and missing values of df in place."""
+        values = None
+        for i, col in enumerate(self.columns):
+            missing = None if col not in df.columns else df[col].isna().to_numpy()
+            if missing is not None and not missing.any():
+                continue
+            if values is None:
+                values = self.lookup(df)
+            if missing is None:
+                df[col] = values[:, i]
+            else:
+                df[col] = np.where(missing, values[:, i], df[col].to_numpy(dtype=np.float64))
+        return df
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'version': IMPUTATION_VERSION,
+                'services': self.services,
+                'instance_types': self.instance_types,
+                'columns': self.columns,
+                'table': self.table.round(4).tolist(),
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != IMPUTATION_VERSION:
+            raise ValueError(f"Unsupported imputation version {data.get('version')} in {path}")
+        return cls(data['services'], data['instance_types'], data['columns'], data['table'])
+
+
+class ImputationStats:
+    """Running per-(Service, InstanceType) sums and counts over training chunks."""
+
+    def __init__(self, services, instance_types, columns=IMPUTED_COLUMNS):
+        self.services = list(services)
+        self.instance_types = list(instance_types)
+        self.columns = list(columns)
+        self.service_dtype = pd.CategoricalDtype(self.services)
+        self.type_dtype = pd.CategoricalDtype(self.instance_types)
+        cells = (len(self.services) + 1) * (len(self.instance_types) + 1)
+        self.sums = np.zeros((cells, len(self.columns)))
+        self.counts = np.zeros((cells, len(self.columns)))
+
+    def add(self, df):
+        s = category_codes(df['Service'], self.service_dtype)
+        t = category_codes(df['InstanceType'], self.type_dtype)
+        cell = s * (len(self.instance_types) + 1) + t
+        for i, col in enumerate(self.columns):
+            if col not in df.columns:
+                continue
+            values = df[col].to_numpy(dtype=np.float64)
+            present = ~np.isnan(values)
+            self.sums[:, i] += np.bincount(cell[present], weights=values[present], minlength=len(self.sums))
+            self.counts[:, i] += np.bincount(cell[present], minlength=len(self.counts))
+        return self
+
+    def table(self):
+        shape = (len(self.services) + 1, len(self.instance_types) + 1, len(self.columns))
+        sums, counts = self.sums.reshape(shape), self.counts.reshape(shape)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overall = sums.sum(axis=(0, 1)) / counts.sum(axis=(0, 1))
+            per_service = sums.sum(axis=1) / counts.sum(axis=1)
+            cell = sums / counts
+        defaults = np.array([DEFAULT_VALUES.get(col, 0.0) for col in self.columns])
+        overall = np.where(np.isfinite(overall), overall, defaults)
+        per_service = np.where(np.isfinite(per_service), per_service, overall)
+        table = np.where(np.isfinite(cell), cell, per_service[:, None, :])
+        table[:, -1] = per_service
+        table[-1, :] = overall
+        return ImputationTable(self.services, self.instance_types, self.columns, table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the imputation table from the training data.")
+    parser.add_argument('--data', default='aws_usage_data.csv')
+    parser.add_argument('--encoder', default='feature_encoder.json')
+    parser.add_argument('--output', default='imputation_table.json')
+    parser.add_argument('--chunk-rows', type=int, default=500000)
+    args = parser.parse_args()
+
+    from feature_encoder import FeatureEncoder
+    from upload_reader import detect_format, read_upload
+
+    # The encoder's classes fix the table's layout, as they did in training
+    encoder = FeatureEncoder.load(args.encoder)
+    stats = ImputationStats(encoder.classes['Service'], encoder.classes['InstanceType'])
+    for chunk in read_upload(args.data, detect_format(args.data), ['Service', 'InstanceType', *IMPUTED_COLUMNS],
+                             chunksize=args.chunk_rows):
+        stats.add(chunk)
+    stats.table().save(args.output)
+    print(f"✅ Imputation table saved as {args.output}")
+
+
+if __name__ == '__main__':
+    main()
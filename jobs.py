@@ -0,0 +1,175 @@
+"""Background analysis jobs run on a bounded process pool.
+
+Job state lives on disk under JOBS_DIR, one directory per job:
+
+    jobs/
+      3f2a.../
+        upload.csv     <- input (original suffix kept), removed once the job finishes
+        status.json    <- state, stage, rows_processed, error
+        result.json    <- written when the job is done
+
+Any gunicorn worker can answer a poll or result request for any job, while
+the scoring itself runs in the pool owned by the worker that accepted it.
+If a pool process dies, its jobs are marked failed and the next submission
+starts a fresh pool.
+"""
+import json
+import os
+import pathlib
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+
+from batch import BatchPool
+
+JOBS_DIR = os.environ.get('JOBS_DIR', 'jobs')
+
+# Processes per gunicorn worker that score submitted jobs
+JOB_POOL_WORKERS = int(os.environ.get('JOB_POOL_WORKERS', 2))
+
+# Queued + running jobs a worker accepts before it starts rejecting submissions
+JOB_QUEUE_DEPTH = int(os.environ.get('JOB_QUEUE_DEPTH', 8))
+
+# Seconds a finished job's status and result are kept
+JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 3600))
+
+STATUS_FILE = 'status.json'
+RESULT_FILE = 'result.json'
+UPLOAD_FILE = 'upload'
+
+
+class QueueFull(Exception):
+    pass
+
+
+def write_json(path, data):
+    # Write then rename, so a concurrent reader never sees a partial file
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class JobProgress:
+    """Handle passed to a job function for reporting its stage and row count."""
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.status = {'state': 'queued', 'stage': 'queued', 'rows_processed': 0}
+
+    def update(self, **fields):
+        self.status.update(fields, updated=time.time())
+        write_json(os.path.join(self.job_dir, STATUS_FILE), self.status)
+
+
+def run_job(fn, job_dir, upload_name):
+    # Runs inside a pool process
+    progress = JobProgress(job_dir)
+    upload_path = os.path.join(job_dir, upload_name)
+    try:
+        progress.update(state='running', stage='starting')
+        result = fn(upload_path, progress)
+        write_json(os.path.join(job_dir, RESULT_FILE), result)
+        progress.update(state='done', stage='done')
+    except Exception as e:
+        progress.update(state='failed', error=str(e))
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+
+class JobQueue:
+    def __init__(self, root=JOBS_DIR, workers=JOB_POOL_WORKERS, depth=JOB_QUEUE_DEPTH,
+                 ttl=JOB_RESULT_TTL):
+        self.root = root
+        # Same broken-pool recovery as batch scoring, on a pool of its own
+        self.pool = BatchPool(workers)
+        self.depth = depth
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def job_dir(self, job_id):
+        # Ids are uuid4 hex; anything else cannot name a job directory
+        if len(job_id) != 32 or any(c not in '0123456789abcdef' for c in job_id):
+            return None
+        return os.path.join(self.root, job_id)
+
+    def submit(self, fn, upload):
+        """Save `upload` and queue fn(upload_path, progress) on the pool.
+
+        Raises QueueFull once this worker already holds `depth` unfinished jobs.
+        """
+        # Checked again under the lock; this only avoids saving an upload that would be refused
+        if len(self.pending) >= self.depth:
+            raise QueueFull(f"{len(self.pending)} jobs already queued")
+
+        # Saved before taking the lock, so a large upload doesn't hold up other requests
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.root, job_id)
+        os.makedirs(job_dir)
+        # Keep the suffix (.csv.gz, .parquet, ...) that identifies the format
+        upload_name = UPLOAD_FILE + ''.join(pathlib.PurePath(upload.filename or '').suffixes)
+        upload.save(os.path.join(job_dir, upload_name))
+        JobProgress(job_dir).update()
+
+        with self.lock:
+            if len(self.pending) >= self.depth:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                raise QueueFull(f"{len(self.pending)} jobs already queued")
+            self.expire()
+
+            try:
+                # A child that died earlier broke the pool; this starts a fresh one
+                future = self.pool.submit(run_job, fn, job_dir, upload_name)
+            except BrokenProcessPool:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                raise
+            self.pending[future] = job_dir
+
+        future.add_done_callback(self.finished)
+        return job_id
+
+    def finished(self, future):
+        """Done callback: forget the job, and mark it failed if its process died.
+
+        run_job records its own success or failure, so a future that raised
+        never got that far, e.g. BrokenProcessPool after its process was killed.
+        """
+        with self.lock:
+            job_dir = self.pending.pop(future, None)
+        if job_dir is None or (not future.cancelled() and future.exception() is None):
+            return
+
+        error = 'Job was cancelled' if future.cancelled() else f'Job process exited abruptly: {future.exception()}'
+        status = self.status(os.path.basename(job_dir)) or {}
+        status.update(state='failed', stage='failed', error=error, updated=time.time())
+        write_json(os.path.join(job_dir, STATUS_FILE), status)
+        for name in os.listdir(job_dir):
+            if name.startswith(UPLOAD_FILE):
+                os.remove(os.path.join(job_dir, name))
+
+    def status(self, job_id):
+        job_dir = self.job_dir(job_id)
+        if job_dir is None:
+            return None
+        try:
+            with open(os.path.join(job_dir, STATUS_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def result(self, job_id):
+        with open(os.path.join(self.job_dir(job_id), RESULT_FILE)) as f:
+            return json.load(f)
+
+    def expire(self):
+        if not os.path.isdir(self.root):
+            return
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.root):
+            status = self.status(name)
+            if status and status['state'] in ('done', 'failed') and status['updated'] < cutoff:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
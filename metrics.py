@@ -0,0 +1,259 @@
+"""Low-overhead counters, gauges and histograms rendered in Prometheus text format.
+
+Every metric owns fixed slots in one float64 array per process, so recording
+is a single array update, made under a per-process lock so request threads
+never lose each other's increments. With METRICS_DIR set the array is a
+memory-mapped file per process (metrics_<pid>.bin) and render() sums all of
+them, so one scrape covers every gunicorn worker and job pool process.
+Without it each process reports only its own values.
+
+When a process exits, retire() folds its counters and histograms into
+metrics_retired.bin, drops its gauges and removes its file. gunicorn.conf.py
+calls it from child_exit, and a scrape retires the files of any other
+process that is gone, such as a pool child.
+"""
+import fcntl
+import glob
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import numpy as np
+
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+# Seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Bytes
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9, 1e10)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+RETIRED_FILE = 'metrics_retired.bin'
+LOCK_FILE = '.lock'
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    def __init__(self, root=METRICS_DIR):
+        self.root = root
+        self.metrics = []
+        self.size = 0
+        self.gauge_slots = []
+        self.pid = None
+        self.array = None
+        self.lock = threading.Lock()
+        # A lock held by another thread at fork time would never be released in the child
+        os.register_at_fork(after_in_child=self.reset_lock)
+
+    def reset_lock(self):
+        self.lock = threading.Lock()
+
+    def reserve(self, metric, slots):
+        offset = self.size
+        self.size += slots
+        self.metrics.append(metric)
+        if metric.kind == 'gauge':
+            self.gauge_slots.extend(range(offset, offset + slots))
+        return offset
+
+    def add(self, *updates):
+        """Apply (slot, amount) updates together."""
+        with self.lock:
+            values = self.values
+            for slot, amount in updates:
+                values[slot] += amount
+
+    @property
+    def values(self):
+        # Created on first use in each process, so forked workers never share slots
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            if self.root:
+                os.makedirs(self.root, exist_ok=True)
+                path = os.path.join(self.root, f'metrics_{self.pid}.bin')
+                self.array = np.memmap(path, dtype=np.float64, mode='w+', shape=(self.size,))
+            else:
+                self.array = np.zeros(self.size)
+        return self.array
+
+    def retire(self, pid):
+        """Fold an exited process's counters into the retired totals and remove its file."""
+        if not self.root:
+            return
+        path = os.path.join(self.root, f'metrics_{pid}.bin')
+        with open(os.path.join(self.root, LOCK_FILE), 'w') as lock:
+            # Serializes the gunicorn master and scraping workers
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                values = np.fromfile(path, dtype=np.float64)
+            except FileNotFoundError:
+                return
+            if len(values) == self.size:
+                # Counters keep counting; the process's gauges no longer apply
+                values[self.gauge_slots] = 0
+                retired_path = os.path.join(self.root, RETIRED_FILE)
+                if os.path.exists(retired_path):
+                    retired = np.fromfile(retired_path, dtype=np.float64)
+                    if len(retired) == self.size:
+                        values += retired
+                tmp = f'{retired_path}.tmp'
+                values.tofile(tmp)
+                os.replace(tmp, retired_path)
+            os.remove(path)
+
+    def totals(self):
+        if not self.root:
+            with self.lock:
+                return self.values.copy()
+        paths = glob.glob(os.path.join(self.root, 'metrics_*.bin'))
+        for path in paths:
+            pid = os.path.basename(path)[len('metrics_'):-len('.bin')]
+            if pid.isdigit() and not process_alive(int(pid)):
+                self.retire(int(pid))
+
+        totals = np.zeros(self.size)
+        with open(os.path.join(self.root, LOCK_FILE), 'w') as lock:
+            # No file is folded into the retired totals while they are summed
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            for path in glob.glob(os.path.join(self.root, 'metrics_*.bin')):
+                values = np.fromfile(path, dtype=np.float64)
+                # Files from a process running an older metric layout are skipped
+                if len(values) == self.size:
+                    totals += values
+        return totals
+
+    def render(self):
+        totals = self.totals()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.doc}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for value in metric.label_values:
+                lines.extend(metric.render(totals, value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Base for metrics with at most one label, whose values are declared up front."""
+
+    kind = None
+    width = 1
+
+    def __init__(self, name, doc, label=None, values=()):
+        self.name = name
+        self.doc = doc
+        self.label = label
+        self.label_values = list(values) if label else [None]
+        self.offset = registry.reserve(self, self.width * len(self.label_values))
+        self.slots = {value: self.offset + i * self.width for i, value in enumerate(self.label_values)}
+
+    def label_pairs(self, value):
+        return [(self.label, value)] if self.label else []
+
+    def render(self, totals, value):
+        slot = self.slots[value]
+        return [f'{self.name}{format_labels(self.label_pairs(value))} {format_value(totals[slot])}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, label=None):
+        registry.add((self.slots[label], amount))
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, label=None):
+        registry.add((self.slots[label], amount))
+
+    def dec(self, amount=1, label=None):
+        registry.add((self.slots[label], -amount))
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, doc, buckets=LATENCY_BUCKETS, label=None, values=()):
+        self.buckets = list(buckets)
+        # One count per bucket plus +Inf, then the sum and the total count
+        self.width = len(self.buckets) + 3
+        super().__init__(name, doc, label, values)
+
+    def observe(self, amount, label=None):
+        slot = self.slots[label]
+        registry.add((slot + bisect_left(self.buckets, amount), 1),
+                     (slot + len(self.buckets) + 1, amount),
+                     (slot + len(self.buckets) + 2, 1))
+
+    @contextmanager
+    def time(self, label=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, label)
+
+    def timed(self, iterable, label=None):
+        """Yield from iterable, observing the time each item took to produce."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(time.perf_counter() - start, label)
+            yield item
+
+    def render(self, totals, value):
+        slot = self.slots[value]
+        pairs = self.label_pairs(value)
+        lines = []
+        cumulative = 0
+        for i, bound in enumerate(self.buckets + ['+Inf']):
+            cumulative += totals[slot + i]
+            le = bound if bound == '+Inf' else format_value(bound)
+            lines.append(f'{self.name}_bucket{format_labels(pairs + [("le", le)])} {format_value(cumulative)}')
+        lines.append(f'{self.name}_sum{format_labels(pairs)} {format_value(totals[slot + len(self.buckets) + 1])}')
+        lines.append(f'{self.name}_count{format_labels(pairs)} {format_value(totals[slot + len(self.buckets) + 2])}')
+        return lines
+
+
+STAGES = ['parse', 'encode', 'predict', 'price', 'aggregate', 'terraform', 'serialize']
+
+stage_seconds = Histogram('infratrim_stage_seconds', 'Time spent in each request processing stage.',
+                          label='stage', values=STAGES)
+rows_processed = Counter('infratrim_rows_processed_total', 'Rows scored by the model.')
+unique_vectors = Counter('infratrim_unique_vectors_total', 'Distinct feature vectors among scored rows.')
+prediction_cache_hits = Counter('infratrim_prediction_cache_hits_total',
+                                'Distinct feature vectors answered from the prediction cache.')
+request_bytes = Histogram('infratrim_request_bytes', 'Request body sizes in bytes.', buckets=SIZE_BUCKETS)
+requests_in_flight = Gauge('infratrim_requests_in_flight', 'Requests currently being handled.')
@@ -0,0 +1,187 @@
+"""Versioned, memory-mapped model artifacts with hot reload.
+
+An artifact is a directory under the store root holding the compiled forest's
+node arrays (.npy), the sklearn forest for large batches, the feature
+encoder, the imputation table and the feature list:
+
+    models/
+      CURRENT                  <- name of the active version
+      20261017160344/
+        manifest.json
+        feature_encoder.json
+        imputation.json
+        feature.npy threshold.npy children.npy value.npy roots.npy ...
+        model.joblib             <- only read with COMPILED_FOREST_LOAD_SKLEARN
+
+The forest arrays are memory-mapped read-only, so every gunicorn worker that
+loads a version shares one physical copy through the page cache. Publishing a
+new version writes it under a temporary name, renames it into place and then
+replaces CURRENT, so readers never see a half-written artifact.
+
+    python model_store.py            # export cost_optimizer_model.pkl
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from feature_encoder import FeatureEncoder
+from forest_engine import CompiledForest
+from imputation import ImputationTable
+
+MODEL_DIR = os.environ.get('MODEL_DIR', 'models')
+
+# Seconds between checks of CURRENT for a newly published version
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 5))
+
+POINTER_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+ENCODER_FILE = 'feature_encoder.json'
+IMPUTATION_FILE = 'imputation.json'
+
+
+class ModelBundle:
+    """One loaded model version: the forest, its encoder, imputation table and feature list."""
+
+    def __init__(self, version, forest, encoder, features, imputation=None):
+        self.version = version
+        self.forest = forest
+        self.encoder = encoder
+        self.features = features
+        # Versions published without a table impute fixed defaults
+        self.imputation = imputation or ImputationTable.constant()
+
+
+def publish(model, encoder, features, root=MODEL_DIR, version=None, imputation=None):
+    """Write a fitted model as a new artifact version and make it current."""
+    version = version or datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+    final_path = os.path.join(root, version)
+    staging_path = os.path.join(root, f'.{version}.tmp')
+    if os.path.exists(final_path):
+        raise ValueError(f"Model version {version} already exists in {root}")
+
+    os.makedirs(root, exist_ok=True)
+    forest = model if isinstance(model, CompiledForest) else CompiledForest.from_sklearn(model)
+    forest.save(staging_path)
+    encoder.save(os.path.join(staging_path, ENCODER_FILE))
+    if imputation is not None:
+        imputation.save(os.path.join(staging_path, IMPUTATION_FILE))
+    with open(os.path.join(staging_path, MANIFEST_FILE), 'w') as f:
+        json.dump({
+            'version': version,
+            'features': list(features),
+            'created': datetime.now(timezone.utc).isoformat(),
+        }, f, indent=2)
+    os.rename(staging_path, final_path)
+
+    pointer_tmp = os.path.join(root, f'.{POINTER_FILE}.tmp')
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root, POINTER_FILE))
+    return version
+
+
+def load_bundle(root, version):
+    path = os.path.join(root, version)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    imputation_path = os.path.join(path, IMPUTATION_FILE)
+    return ModelBundle(
+        version=manifest['version'],
+        forest=CompiledForest.load(path),
+        encoder=FeatureEncoder.load(os.path.join(path, ENCODER_FILE)),
+        features=manifest['features'],
+        imputation=ImputationTable.load(imputation_path) if os.path.exists(imputation_path) else None,
+    )
+
+
+class ModelStore:
+    """Serves the current model version and swaps in new ones as they are published.
+
+    Callers take one bundle per request with current() and use it throughout,
+    so a swap never changes the model under an in-flight request. The old
+    bundle stays alive until the last request holding it finishes.
+
+    With load=False nothing is read until the first current() call, which
+    loads under the lock so concurrent callers wait for one load.
+    """
+
+    def __init__(self, root=MODEL_DIR, reload_interval=MODEL_RELOAD_INTERVAL, fallback=None, load=True):
+        self.root = root
+        self.reload_interval = reload_interval
+        self.fallback = fallback
+        self.lock = threading.Lock()
+        self.bundle = None
+        self.checked_at = 0.0
+        if load:
+            self.refresh()
+
+    def read_pointer(self):
+        try:
+            with open(os.path.join(self.root, POINTER_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        version = self.read_pointer()
+        if version is None:
+            if self.bundle is None:
+                if self.fallback is None:
+                    raise FileNotFoundError(f"No published model in {self.root}")
+                print(f"⚠️  No published model in {self.root}, loading fallback")
+                self.bundle = self.fallback()
+            return self.bundle
+
+        if self.bundle is None or version != self.bundle.version:
+            self.bundle = load_bundle(self.root, version)
+            print(f"🔁 Model version {version} loaded")
+        return self.bundle
+
+    def current(self):
+        if self.bundle is None:
+            with self.lock:
+                if self.bundle is None:
+                    self.checked_at = time.monotonic()
+                    self.refresh()
+            return self.bundle
+
+        now = time.monotonic()
+        if now - self.checked_at >= self.reload_interval and self.lock.acquire(blocking=False):
+            try:
+                self.checked_at = now
+                self.refresh()
+            except Exception as e:
+                # Keep serving the loaded version if the new one is unreadable
+                print(f"❌ Model reload failed: {str(e)}")
+            finally:
+                self.lock.release()
+        return self.bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish a trained model as a memory-mappable artifact.")
+    parser.add_argument('--model', default='cost_optimizer_model.pkl')
+    parser.add_argument('--encoder', default='feature_encoder.json')
+    parser.add_argument('--features', default='model_features.json')
+    parser.add_argument('--imputation', default='imputation_table.json',
+                        help='imputation table, skipped if the file does not exist')
+    parser.add_argument('--root', default=MODEL_DIR)
+    parser.add_argument('--version')
+    args = parser.parse_args()
+
+    import joblib
+
+    model = joblib.load(args.model)
+    with open(args.features) as f:
+        features = json.load(f)
+    imputation = ImputationTable.load(args.imputation) if os.path.exists(args.imputation) else None
+    version = publish(model, FeatureEncoder.load(args.encoder), features,
+                      root=args.root, version=args.version, imputation=imputation)
+    print(f"✅ Published model version {version} to {args.root}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Scores each distinct feature vector once and remembers recent results.
+
+Usage exports repeat the same (Service, InstanceType, Region, RunningHours,
+utilization) rows across days and resources. PredictionCache.predict()
+collapses a batch to its unique encoded rows first:
+
+1. Each row is hashed to 64 bits and the hashes are factorized. That is one
+   O(rows) hash-table pass, with no sort. The grouping is checked against
+   the rows themselves, and a hash collision falls back to an exact np.unique.
+2. Unique rows are looked up in a per-process LRU of recent
+   vector -> (label, confidence) results. The LRU is keyed by the row's
+   bytes and holds one model version at a time.
+3. Only the misses walk the forest. The labels and confidences are then
+   broadcast back to every row.
+
+Unique vectors and LRU hits are counted in /api/metrics next to the rows
+scored. stats() reports the dedup ratio for /api/cache.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from metrics import prediction_cache_hits, unique_vectors
+
+# Unique feature vectors remembered per process across requests; 0 turns the LRU off
+PREDICTION_CACHE_ENTRIES = int(os.environ.get('PREDICTION_CACHE_ENTRIES', 100000))
+
+
+def unique_rows(X):
+    """(inverse, first): each row's unique-vector index, and one row index per unique vector."""
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(X), index=False).to_numpy()
+    inverse, uniques = pd.factorize(hashes)
+    first = np.empty(len(uniques), dtype=np.int64)
+    # Any row of a group will do, since the groups are checked below
+    first[inverse] = np.arange(len(X))
+    if not (X == X[first][inverse]).all():
+        # Two different vectors shared a hash
+        row = np.dtype((np.void, X.dtype.itemsize * X.shape[1]))
+        _, first, inverse = np.unique(np.ascontiguousarray(X).view(row).ravel(),
+                                      return_index=True, return_inverse=True)
+    return inverse, first
+
+
+class PredictionCache:
+    def __init__(self, entries=PREDICTION_CACHE_ENTRIES):
+        self.entries = entries
+        self.lock = threading.Lock()
+        self.version = None
+        self.results = OrderedDict()
+        self.counters = {'rows': 0, 'unique': 0, 'hits': 0}
+
+    def predict(self, bundle, X):
+        """(labels, confidence) per row of X, like bundle.forest.predict."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        inverse, first = unique_rows(X)
+        vectors = X[first]
+        keys = [row.tobytes() for row in vectors] if self.entries else []
+
+        labels = np.empty(len(vectors), dtype=object)
+        confidence = np.empty(len(vectors), dtype=np.float64)
+        missing = np.ones(len(vectors), dtype=bool)
+        if keys:
+            with self.lock:
+                if self.version != bundle.version:
+                    self.version = bundle.version
+                    self.results.clear()
+                for i, key in enumerate(keys):
+                    hit = self.results.get(key)
+                    if hit is not None:
+                        self.results.move_to_end(key)
+                        labels[i], confidence[i] = hit
+                        missing[i] = False
+
+        misses = np.flatnonzero(missing)
+        if len(misses):
+            labels[misses], confidence[misses] = bundle.forest.predict(vectors[misses])
+            if keys:
+                with self.lock:
+                    if self.version == bundle.version:
+                        for i in misses:
+                            self.results[keys[i]] = (labels[i], confidence[i])
+                        while len(self.results) > self.entries:
+                            self.results.popitem(last=False)
+
+        hits = len(vectors) - len(misses)
+        unique_vectors.inc(len(vectors))
+        prediction_cache_hits.inc(hits)
+        with self.lock:
+            self.counters['rows'] += len(X)
+            self.counters['unique'] += len(vectors)
+            self.counters['hits'] += hits
+        return labels[inverse], confidence[inverse]
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+            cached = len(self.results)
+        return {
+            **counters,
+            'dedup_ratio': round(counters['rows'] / counters['unique'], 2) if counters['unique'] else None,
+            'entries': cached,
+            'max_entries': self.entries,
+            'model_version': self.version,
+        }
@@ -0,0 +1,281 @@
+"""Per-resource pricing index used to estimate savings for each scored row.
+
+The index is a dense table over (service, instance type, region) holding the
+unit price and the recommended smaller target type. Prices only need to be
+consistent within a service: hourly for EC2 and RDS, per GB-month for S3 and
+EBS, per invocation for Lambda. A row's savings is its cost times the rate of
+its recommendation:
+
+- terminate, delete_unused: the whole cost
+- reserved_instance: the reserved instance discount
+- downsize, reduce_memory: 1 - price(index target) / price(current type)
+- move_to_glacier, intelligent_tiering, downgrade_to_gp3: the same, with the
+  storage class or volume type the recommendation moves to
+- optimal, upsize: nothing
+- anything else, or a row whose type or region is not in the index: the
+  fallback rate
+
+Every lookup is an array index by category code, so pricing millions of rows
+is a handful of NumPy operations. Without PRICING_FILE the index is built
+from the price tables below, which generate_data.py also draws its synthetic
+costs from. A PRICING_FILE written by
+`python pricing.py` (and then edited) is reloaded when it changes on disk.
+
+    python pricing.py                # write the built-in prices to pricing.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+PRICING_FILE = os.environ.get('PRICING_FILE', 'pricing.json')
+
+# Seconds between checks of PRICING_FILE for changes
+PRICING_RELOAD_INTERVAL = float(os.environ.get('PRICING_RELOAD_INTERVAL', 30))
+
+PRICING_VERSION = 1
+
+# Built-in catalog: instance types per service, and the regions they are priced in
+INSTANCE_TYPES = {
+    'EC2': ['t3.micro', 't3.small', 't3.medium', 't3.large', 't3.xlarge', 't3.2xlarge',
+            'm5.large', 'm5.xlarge', 'm5.2xlarge', 'c5.large', 'c5.xlarge'],
+    'RDS': ['db.t3.micro', 'db.t3.small', 'db.t3.medium', 'db.r5.large', 'db.r5.xlarge'],
+    'S3': ['Standard', 'Intelligent-Tiering', 'Glacier'],
+    'Lambda': ['128MB', '256MB', '512MB', '1024MB'],
+    'EBS': ['gp2', 'gp3', 'io1', 'io2']
+}
+REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1', 'eu-central-1', 'ap-south-1', 'ap-southeast-1']
+
+# On-demand prices per hour (EC2, RDS) and per GB-month (S3, EBS)
+HOURLY_COST = {
+    't3.micro': 0.0104, 't3.small': 0.0208, 't3.medium': 0.0416,
+    't3.large': 0.0832, 't3.xlarge': 0.1664, 't3.2xlarge': 0.3328,
+    'm5.large': 0.096, 'm5.xlarge': 0.192, 'm5.2xlarge': 0.384,
+    'c5.large': 0.085, 'c5.xlarge': 0.17,
+    'db.t3.micro': 0.017, 'db.t3.small': 0.034, 'db.t3.medium': 0.068,
+    'db.r5.large': 0.24, 'db.r5.xlarge': 0.48
+}
+COST_PER_GB = {
+    'Standard': 0.023, 'Intelligent-Tiering': 0.0125, 'Glacier': 0.004,
+    'gp2': 0.10, 'gp3': 0.08, 'io1': 0.125, 'io2': 0.125
+}
+
+# Lambda pricing: per request and per MB-invocation
+LAMBDA_REQUEST_COST = 0.0000002
+LAMBDA_MB_COST = 0.0000000167
+
+# Savings rate when a row can't be priced; the flat estimate used before the index
+FALLBACK_SAVINGS_RATE = 0.3
+
+# Typical 1-year no-upfront reserved instance discount
+RESERVED_DISCOUNT = 0.4
+
+# Next size down for types the model may recommend downsizing
+DOWNSIZE_TARGETS = {
+    't3.small': 't3.micro', 't3.medium': 't3.small', 't3.large': 't3.medium',
+    't3.xlarge': 't3.large', 't3.2xlarge': 't3.xlarge',
+    'm5.large': 't3.large', 'm5.xlarge': 'm5.large', 'm5.2xlarge': 'm5.xlarge',
+    'c5.large': 't3.large', 'c5.xlarge': 'c5.large',
+    'db.t3.small': 'db.t3.micro', 'db.t3.medium': 'db.t3.small',
+    'db.r5.large': 'db.t3.medium', 'db.r5.xlarge': 'db.r5.large',
+    '256MB': '128MB', '512MB': '256MB', '1024MB': '512MB',
+}
+
+# Recommendation -> fixed savings rate, or None to price it against a target type
+RATES = {
+    'optimal': 0.0,
+    'upsize': 0.0,
+    'terminate': 1.0,
+    'delete_unused': 1.0,
+    'reserved_instance': RESERVED_DISCOUNT,
+    'downsize': None,
+    'reduce_memory': None,
+    'move_to_glacier': None,
+    'intelligent_tiering': None,
+    'downgrade_to_gp3': None,
+}
+
+# Recommendations whose target type is fixed rather than taken from the index
+FIXED_TARGETS = {
+    'move_to_glacier': 'Glacier',
+    'intelligent_tiering': 'Intelligent-Tiering',
+    'downgrade_to_gp3': 'gp3',
+}
+
+# Target code meaning "use the index's target for this row"
+INDEX_TARGET = -2
+
+
+def builtin_prices():
+    """Price rows from the built-in tables, the same in every region."""
+    rows = []
+    for service, types in INSTANCE_TYPES.items():
+        for instance_type in types:
+            if service == 'Lambda':
+                memory_mb = int(instance_type.replace('MB', ''))
+                price = LAMBDA_REQUEST_COST + memory_mb * LAMBDA_MB_COST
+            elif instance_type in HOURLY_COST:
+                price = HOURLY_COST[instance_type]
+            else:
+                price = COST_PER_GB[instance_type]
+            for region in REGIONS:
+                rows.append({
+                    'service': service,
+                    'instance_type': instance_type,
+                    'region': region,
+                    'price': price,
+                    'target': DOWNSIZE_TARGETS.get(instance_type, instance_type),
+                })
+    return rows
+
+
+def category_codes(values, categories):
+    # -1 for values not in categories
+    return pd.Series(values).astype(pd.CategoricalDtype(categories)).cat.codes.to_numpy()
+
+
+class PricingIndex:
+    """Dense price and target arrays indexed by (service, instance type, region) codes."""
+
+    def __init__(self, prices, version='builtin', reserved_discount=RESERVED_DISCOUNT,
+                 fallback_rate=FALLBACK_SAVINGS_RATE):
+        self.version = version
+        self.reserved_discount = reserved_discount
+        self.fallback_rate = fallback_rate
+        self.rows = list(prices)
+
+        self.services = sorted({row['service'] for row in self.rows})
+        self.instance_types = sorted({row['instance_type'] for row in self.rows}
+                                     | {row['target'] for row in self.rows})
+        self.regions = sorted({row['region'] for row in self.rows})
+
+        shape = (len(self.services), len(self.instance_types), len(self.regions))
+        self.price = np.full(shape, np.nan)
+        self.target = np.full(shape, -1, dtype=np.int32)
+        table = pd.DataFrame(self.rows, columns=['service', 'instance_type', 'region', 'price', 'target'])
+        s = category_codes(table['service'], self.services)
+        t = category_codes(table['instance_type'], self.instance_types)
+        r = category_codes(table['region'], self.regions)
+        self.price[s, t, r] = table['price'].to_numpy(dtype=np.float64)
+        self.target[s, t, r] = category_codes(table['target'], self.instance_types)
+
+        # Per-recommendation rate and target code, looked up by recommendation code
+        self.recommendations = list(RATES)
+        self.rec_rates = np.array([np.nan if RATES[rec] is None else RATES[rec]
+                                   for rec in self.recommendations])
+        self.rec_rates[self.recommendations.index('reserved_instance')] = reserved_discount
+        self.rec_targets = np.array([
+            category_codes([FIXED_TARGETS[rec]], self.instance_types)[0] if rec in FIXED_TARGETS
+            else INDEX_TARGET
+            for rec in self.recommendations
+        ])
+
+    @classmethod
+    def builtin(cls):
+        return cls(builtin_prices())
+
+    def save(self, path):
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({
+                'version': PRICING_VERSION,
+                'reserved_discount': self.reserved_discount,
+                'fallback_rate': self.fallback_rate,
+                'prices': self.rows,
+            }, f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != PRICING_VERSION:
+            raise ValueError(f"Unsupported pricing version {data.get('version')} in {path}")
+        return cls(data['prices'], version=str(os.stat(path).st_mtime_ns),
+                   reserved_discount=data.get('reserved_discount', RESERVED_DISCOUNT),
+                   fallback_rate=data.get('fallback_rate', FALLBACK_SAVINGS_RATE))
+
+    def rates(self, df):
+        """Savings rate for each row of a scored frame."""
+        s = category_codes(df['Service'], self.services)
+        t = category_codes(df['InstanceType'], self.instance_types)
+        r = category_codes(df['Region'], self.regions)
+        rec = category_codes(df['Recommendation'], self.recommendations)
+
+        known = (s >= 0) & (t >= 0) & (r >= 0)
+        s, t, r = np.where(known, s, 0), np.where(known, t, 0), np.where(known, r, 0)
+        price = np.where(known, self.price[s, t, r], np.nan)
+
+        rates = np.where(rec >= 0, self.rec_rates[rec], self.fallback_rate)
+
+        # Rows priced against a target type
+        target = np.where(rec >= 0, self.rec_targets[rec], -1)
+        target = np.where(target == INDEX_TARGET, self.target[s, t, r], target)
+        target_price = np.where(target >= 0, self.price[s, np.maximum(target, 0), r], np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            priced = np.clip(1 - target_price / price, 0, 1)
+        priced = np.where(np.isfinite(priced) & (price > 0), priced, self.fallback_rate)
+        return np.where(np.isnan(rates), priced, rates)
+
+    def savings(self, df):
+        """Estimated monthly savings for each row of a scored frame."""
+        return df['Cost'].to_numpy(dtype=np.float64) * self.rates(df)
+
+
+class PricingStore:
+    """Serves the pricing index, reloading PRICING_FILE when its mtime changes.
+
+    Like ModelStore, callers take one index per request with current().
+    """
+
+    def __init__(self, path=PRICING_FILE, reload_interval=PRICING_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.index = None
+        self.mtime = None
+        self.checked_at = 0.0
+        self.refresh()
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if self.index is None or mtime != self.mtime:
+            self.index = PricingIndex.builtin() if mtime is None else PricingIndex.load(self.path)
+            self.mtime = mtime
+            print(f"💲 Pricing {self.index.version} loaded ({len(self.index.rows)} prices)")
+        return self.index
+
+    def current(self):
+        now = time.monotonic()
+        if now - self.checked_at >= self.reload_interval and self.lock.acquire(blocking=False):
+            try:
+                self.checked_at = now
+                self.refresh()
+            except Exception as e:
+                # Keep serving the loaded prices if the new file is unreadable
+                print(f"❌ Pricing reload failed: {str(e)}")
+            finally:
+                self.lock.release()
+        return self.index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the built-in pricing index as an editable file.")
+    parser.add_argument('--output', default=PRICING_FILE)
+    args = parser.parse_args()
+
+    index = PricingIndex.builtin()
+    index.save(args.output)
+    print(f"✅ Wrote {len(index.rows)} prices to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Content-addressed cache for analysis and Terraform responses.
+
+Keys are SHA-256 digests of the request content (uploaded bytes, payload)
+plus anything else the response depends on, such as the model version.
+Every key also covers RESPONSE_VERSION and CACHE_VERSION, so a deploy that
+changes how responses are built never serves ones built by the old code.
+Values are JSON-serializable responses kept in two tiers:
+
+- memory: a per-worker LRU of CACHE_MEMORY_ENTRIES responses
+- disk: one JSON file per key under CACHE_DIR, shared by all workers and
+  trimmed oldest-first once it grows past CACHE_DISK_MAX_MB
+
+Entries in both tiers expire after CACHE_TTL seconds.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.environ.get('CACHE_DIR', 'cache')
+CACHE_MEMORY_ENTRIES = int(os.environ.get('CACHE_MEMORY_ENTRIES', 64))
+CACHE_DISK_MAX_MB = float(os.environ.get('CACHE_DISK_MAX_MB', 256))
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 86400))
+
+HASH_BLOCK_BYTES = 1 << 20
+
+# Bump whenever a cached response's shape or the Terraform templates change
+RESPONSE_VERSION = 2
+
+# Build identifier, e.g. the git SHA, set at image build time
+CACHE_VERSION = os.environ.get('CACHE_VERSION', '')
+
+
+def content_key(namespace, *parts, stream=None, data=None):
+    """Digest of `parts` and, if given, every byte of `stream` (rewound afterwards).
+
+    `data` is any buffer, such as a memory-mapped upload, hashed in place.
+    It gives the same key as a stream of the same bytes.
+    """
+    digest = hashlib.sha256(namespace.encode())
+    for part in (RESPONSE_VERSION, CACHE_VERSION, *parts):
+        digest.update(b'\0' + str(part).encode())
+    if data is not None:
+        digest.update(b'\0')
+        digest.update(data)
+    if stream is not None:
+        digest.update(b'\0')
+        for block in iter(lambda: stream.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+        stream.seek(0)
+    return f'{namespace}-{digest.hexdigest()}'
+
+
+def payload_key(namespace, payload, *parts):
+    return content_key(namespace, json.dumps(payload, sort_keys=True), *parts)
+
+
+class ResultCache:
+    def __init__(self, root=CACHE_DIR, memory_entries=CACHE_MEMORY_ENTRIES,
+                 disk_max_bytes=CACHE_DISK_MAX_MB * 1024 * 1024, ttl=CACHE_TTL):
+        self.root = root
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def path(self, key):
+        return os.path.join(self.root, f'{key}.json')
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at < self.ttl:
+                    self.memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return value
+                del self.memory[key]
+
+        value = self.get_disk(key, now)
+        with self.lock:
+            if value is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['disk_hits'] += 1
+            self.remember(key, value, now)
+            return value
+
+    def get_disk(self, key, now):
+        if not self.root:
+            return None
+        path = self.path(key)
+        try:
+            if now - os.path.getmtime(path) >= self.ttl:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key, value):
+        now = time.time()
+        with self.lock:
+            self.counters['stores'] += 1
+            self.remember(key, value, now)
+
+        if self.root:
+            os.makedirs(self.root, exist_ok=True)
+            # Write then rename, so other workers never read a partial entry
+            tmp = f'{self.path(key)}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp, self.path(key))
+            self.trim_disk()
+
+    def remember(self, key, value, now):
+        self.memory[key] = (now, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def trim_disk(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self.lock:
+                self.counters['evictions'] += 1
+
+    def stats(self):
+        with self.lock:
+            hits = self.counters['memory_hits'] + self.counters['disk_hits']
+            lookups = hits + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0,
+                'memory_entries': len(self.memory),
+            }
@@ -0,0 +1,208 @@
+"""Out-of-core Random Forest training with a latency-aware model-size sweep.
+
+The training data is streamed in chunks and never held in memory at once:
+
+1. Survey pass: collect the encoder's categories and the label set, keep a
+   few rows of every class as anchors, and reservoir-sample a validation set
+   from the held-out rows (every HOLDOUT_EVERY-th row).
+2. Training pass: each chunk, plus the class anchors so every chunk sees
+   every label, grows a small batch of trees at each candidate depth. Trees
+   from different chunks share one class order and are merged into a single
+   forest, so the result is an ordinary RandomForestClassifier. The same
+   pass accumulates the imputation table's per-(Service, InstanceType) means.
+3. Sweep: for each (trees, depth), the first `trees` trees (taken round-robin
+   across chunks) are compiled and scored for accuracy, per-row inference
+   latency and artifact size. The smallest model that meets the accuracy
+   floor and the latency budget is selected.
+"""
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from feature_encoder import ENCODED_COLUMNS, FeatureEncoder
+from forest_engine import CompiledForest
+from imputation import ImputationStats
+from upload_reader import detect_format, input_columns, read_upload
+
+# Every HOLDOUT_EVERY-th row is held out for validation, in both passes
+HOLDOUT_EVERY = 10
+
+# Rows of each class added to every chunk
+ANCHORS_PER_CLASS = 20
+
+# Rows per timed batch when measuring inference latency
+LATENCY_BATCH = 1000
+
+
+def read_chunks(path, features, chunk_rows):
+    columns = input_columns(features, extra=['Recommendation'])
+    return read_upload(path, detect_format(path), columns, chunksize=chunk_rows)
+
+
+def holdout_mask(offset, rows):
+    return (np.arange(offset, offset + rows) % HOLDOUT_EVERY) == 0
+
+
+def survey(path, features, chunk_rows, validation_rows, seed):
+    """First pass: encoder, classes, per-class anchor rows and a validation sample."""
+    rng = np.random.default_rng(seed)
+    categories = {col: set() for col in ENCODED_COLUMNS}
+    anchors = {}
+    validation, keys = None, np.empty(0)
+    rows = 0
+
+    for chunk in read_chunks(path, features, chunk_rows):
+        for col in ENCODED_COLUMNS:
+            categories[col].update(chunk[col].dropna().unique())
+
+        held = holdout_mask(rows, len(chunk))
+        rows += len(chunk)
+
+        # Reservoir of held-out rows: keep the validation_rows smallest random keys
+        validation = pd.concat([validation, chunk[held]], ignore_index=True)
+        keys = np.concatenate([keys, rng.random(held.sum())])
+        if len(validation) > validation_rows:
+            keep = np.sort(np.argpartition(keys, validation_rows)[:validation_rows])
+            validation, keys = validation.iloc[keep].reset_index(drop=True), keys[keep]
+
+        for label, group in chunk[~held].groupby('Recommendation'):
+            have = anchors.get(label)
+            missing = ANCHORS_PER_CLASS - (0 if have is None else len(have))
+            if missing > 0:
+                anchors[label] = pd.concat([have, group.head(missing)], ignore_index=True)
+
+    encoder = FeatureEncoder({col: sorted(values) for col, values in categories.items()})
+    return encoder, rows, pd.concat(anchors.values(), ignore_index=True), validation
+
+
+def train_chunk_forests(path, features, params, encoder, anchors, chunk_rows, trees_per_chunk,
+                        depths, seed):
+    """Second pass: per depth, a list with each chunk's trees, plus imputation stats."""
+    encoder.encode(anchors)
+    stats = ImputationStats(encoder.classes['Service'], encoder.classes['InstanceType'])
+    trees = {depth: [] for depth in depths}
+    template = None
+    rows = 0
+
+    for i, chunk in enumerate(read_chunks(path, features, chunk_rows)):
+        held = holdout_mask(rows, len(chunk))
+        rows += len(chunk)
+        train = encoder.encode(chunk[~held].copy())
+        stats.add(train)
+        train = pd.concat([train, anchors], ignore_index=True)
+
+        for depth in depths:
+            forest = RandomForestClassifier(**{
+                **params,
+                'n_estimators': trees_per_chunk,
+                'max_depth': depth,
+                'random_state': seed + i,
+            }).fit(train[features], train['Recommendation'])
+            trees[depth].append(forest.estimators_)
+            template = forest
+        print(f"🌲 Chunk {i + 1}: {len(train)} rows, {trees_per_chunk} trees x {len(depths)} depths")
+
+    return trees, template, stats.table()
+
+
+def assemble(chunk_trees, count, template):
+    """A forest of the first `count` trees, taken round-robin across chunks."""
+    ordered = [tree for group in zip(*chunk_trees) for tree in group]
+    estimators = ordered[:count]
+
+    forest = RandomForestClassifier(**{**template.get_params(), 'n_estimators': len(estimators)})
+    forest.estimators_ = estimators
+    forest.classes_ = template.classes_
+    forest.n_classes_ = template.n_classes_
+    forest.n_outputs_ = template.n_outputs_
+    forest.n_features_in_ = template.n_features_in_
+    forest.feature_names_in_ = template.feature_names_in_
+    return forest
+
+
+def artifact_bytes(forest):
+    with tempfile.TemporaryDirectory() as tmp:
+        forest.save(tmp)
+        return sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+
+
+def evaluate(model, X_val, y_val):
+    # Latency batches take the packed walk loaded artifacts serve, and
+    # artifact_bytes counts everything publish() ships, model.joblib included
+    forest = CompiledForest.from_sklearn(model, max_rows=LATENCY_BATCH)
+
+    labels, _ = forest.predict(X_val)
+    batch = X_val[:LATENCY_BATCH]
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        forest.predict(batch)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'accuracy': float((labels == y_val).mean()),
+        'latency_us_per_row': min(timings) / len(batch) * 1e6,
+        'artifact_bytes': artifact_bytes(forest),
+        'nodes': int(len(forest.feature)),
+    }
+
+
+def select(candidates, accuracy_floor, latency_budget_us):
+    """Smallest candidate meeting both targets, else the most accurate within budget."""
+    qualifying = [c for c in candidates
+                  if c['accuracy'] >= accuracy_floor and c['latency_us_per_row'] <= latency_budget_us]
+    if qualifying:
+        return min(qualifying, key=lambda c: c['artifact_bytes']), True
+    within_budget = [c for c in candidates if c['latency_us_per_row'] <= latency_budget_us]
+    return max(within_budget or candidates, key=lambda c: c['accuracy']), False
+
+
+def train_streaming(path, features, params, tree_counts, depths, accuracy_floor,
+                    latency_budget_us, chunk_rows, validation_rows=200000, seed=42):
+    """Run both passes and the sweep. Returns (model, encoder, imputation, report)."""
+    print("📊 Surveying data...")
+    encoder, rows, anchors, validation = survey(path, features, chunk_rows, validation_rows, seed)
+    chunks = math.ceil(rows / chunk_rows)
+    trees_per_chunk = math.ceil(max(tree_counts) / chunks)
+    print(f"✅ {rows} rows in {chunks} chunks, {len(validation)} validation rows, "
+          f"{len(anchors)} class anchors")
+
+    print("\n🌲 Training...")
+    start = time.perf_counter()
+    trees, template, imputation = train_chunk_forests(path, features, params, encoder, anchors,
+                                                      chunk_rows, trees_per_chunk, depths, seed)
+    fit_seconds = time.perf_counter() - start
+
+    encoder.encode(validation)
+    X_val = validation[features].to_numpy(dtype=np.float64)
+    y_val = validation['Recommendation'].to_numpy()
+
+    print("\n📏 Sweeping model size...")
+    candidates, models = [], {}
+    for depth in depths:
+        for count in tree_counts:
+            model = assemble(trees[depth], count, template)
+            result = {'trees': count, 'max_depth': depth, **evaluate(model, X_val, y_val)}
+            candidates.append(result)
+            models[(count, depth)] = model
+            print(f"   {count:>4} trees, depth {depth:>3}: {result['accuracy'] * 100:6.2f}% "
+                  f"{result['latency_us_per_row']:8.2f} us/row {result['artifact_bytes'] / 1e6:8.1f} MB")
+
+    chosen, met_targets = select(candidates, accuracy_floor, latency_budget_us)
+    report = {
+        'rows': rows,
+        'chunks': chunks,
+        'validation_rows': len(validation),
+        'fit_seconds': fit_seconds,
+        'accuracy_floor': accuracy_floor,
+        'latency_budget_us': latency_budget_us,
+        'met_targets': met_targets,
+        'selected': chosen,
+        'candidates': candidates,
+    }
+    return models[(chosen['trees'], chosen['max_depth'])], encoder, imputation, report
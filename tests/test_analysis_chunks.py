@@ -0,0 +1,100 @@
+"""/api/analyze responses for a whole upload against the same upload in chunks.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import backend
+from backend import FEATURES, AnalysisAggregate, analyze_account
+from feature_encoder import FeatureEncoder
+from forest_engine import CompiledForest
+from model_store import ModelBundle, ModelStore
+from pricing import INSTANCE_TYPES, REGIONS
+
+LABELS = np.array(['downsize', 'optimal', 'reserved_instance', 'terminate'])
+
+DIMENSIONS = ['Region', 'Month']
+
+
+@pytest.fixture(scope='module')
+def upload(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    rows = 60
+    services = rng.choice(list(INSTANCE_TYPES), rows)
+    df = pd.DataFrame({
+        'ResourceId': [f'r-{i:03d}' for i in range(rows)],
+        # Spans more than TREND_MAX_DAYS, so the oldest rows expire
+        'Date': [str(day) for day in np.datetime64('2023-01-01') + rng.integers(0, 1000, rows)],
+        'Service': services,
+        'InstanceType': [rng.choice(INSTANCE_TYPES[service]) for service in services],
+        'Region': rng.choice(REGIONS + ['mars-1'], rows),
+        # Quarters add up exactly in any order
+        'Cost': rng.integers(1, 4000, rows) / 4,
+        'CPUUtilization': rng.uniform(0, 100, rows).round(2),
+        'MemoryUtilization': rng.uniform(0, 100, rows).round(2),
+        'RunningHours': rng.integers(1, 731, rows).astype(float),
+    })
+    df.loc[[3, 17], 'CPUUtilization'] = np.nan
+    df.loc[5, 'Date'] = 'not a date'
+    df.loc[11, 'Date'] = '1999-12-31'
+    df.loc[12, 'Date'] = None
+
+    path = tmp_path_factory.mktemp('upload') / 'usage.csv'
+    df.to_csv(path, index=False)
+    return str(path), df
+
+
+@pytest.fixture(scope='module')
+def bundle(upload):
+    _, df = upload
+    encoder = FeatureEncoder.fit(df)
+    X = np.random.default_rng(1).uniform(0, 100, (400, len(FEATURES)))
+    y = LABELS[np.random.default_rng(2).integers(0, len(LABELS), len(X))]
+    # One fully grown tree gives every row a confidence of exactly 100, so
+    # confidence sums don't depend on the order they are added in
+    model = RandomForestClassifier(n_estimators=1, random_state=0).fit(X, y)
+    return ModelBundle('chunk-test', CompiledForest.from_sklearn(model), encoder, FEATURES)
+
+
+@pytest.fixture(autouse=True)
+def model(bundle, tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, 'store', ModelStore(root=str(tmp_path), fallback=lambda: bundle, load=False))
+
+
+def analyze(path, chunk_rows, monkeypatch):
+    monkeypatch.setattr(backend, 'ANALYZE_CHUNK_ROWS', chunk_rows)
+    result = analyze_account(path, DIMENSIONS, 'csv', top=4, passthrough=['ResourceId'], trends=True)
+    return AnalysisAggregate.from_state(result['aggregate'])
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7])
+def test_chunked_upload_matches_whole(upload, chunk_rows, monkeypatch):
+    path, df = upload
+    whole = analyze(path, len(df), monkeypatch).to_response()
+    chunked = analyze(path, chunk_rows, monkeypatch).to_response()
+
+    assert whole['total_rows'] == len(df)
+    assert whole['top_resources'] and whole['trends']['monthly']
+    assert whole['trends']['undated_rows'] == 2
+    assert whole['trends']['out_of_range_rows'] == 1
+    assert whole['trends']['expired_rows'] > 0
+    assert chunked == whole
+
+
+def test_merged_accounts_match_whole(upload, tmp_path, monkeypatch):
+    path, df = upload
+    whole = analyze(path, len(df), monkeypatch).to_response()
+
+    merged = None
+    for i, part in enumerate([df[:23], df[23:]]):
+        part_path = tmp_path / f'account-{i}.csv'
+        part.to_csv(part_path, index=False)
+        aggregate = analyze(str(part_path), 7, monkeypatch)
+        if merged is None:
+            merged = aggregate
+        else:
+            merged.merge(aggregate)
+    assert merged.to_response() == whole
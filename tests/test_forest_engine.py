@@ -0,0 +1,65 @@
+"""CompiledForest against the sklearn forest it was built from.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+
+from forest_engine import CompiledForest
+
+CLASSES = np.array(['downsize', 'optimal', 'spot', 'terminate'])
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    X, y = make_classification(n_samples=600, n_features=9, n_informative=6, n_classes=len(CLASSES),
+                               random_state=0)
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X, CLASSES[y])
+    return model, X.astype(np.float32)
+
+
+def assert_matches(forest, model, X):
+    labels, confidence = forest.predict(X)
+    np.testing.assert_array_equal(labels, model.predict(X))
+    np.testing.assert_allclose(confidence, model.predict_proba(X).max(axis=1), rtol=0, atol=1e-12)
+
+
+def test_packed_walk_matches_sklearn(fitted):
+    model, X = fitted
+    forest = CompiledForest.from_sklearn(model, max_rows=len(X))
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+    assert_matches(forest, model, X)
+    assert_matches(forest, model, X[:1])
+
+
+def test_large_batches_match_sklearn(fitted):
+    model, X = fitted
+    assert_matches(CompiledForest.from_sklearn(model, max_rows=10), model, X)
+
+
+def test_loaded_artifact_matches_sklearn(fitted, tmp_path):
+    model, X = fitted
+    CompiledForest.from_sklearn(model).save(tmp_path)
+    loaded = CompiledForest.load(tmp_path)
+
+    large = np.resize(X, (loaded.max_rows + 1, X.shape[1]))
+
+    # Every batch walks the mapped node arrays by default
+    assert_matches(loaded, model, X[:loaded.max_rows])
+    assert_matches(loaded, model, large)
+    assert loaded.model is None
+
+    # With load_sklearn, batches above max_rows use the model read back from the artifact
+    loaded.load_sklearn = True
+    assert_matches(loaded, model, large)
+    assert loaded.model is not None
+
+
+def test_rejects_nan(fitted):
+    model, X = fitted
+    X = X[:5].copy()
+    X[2, 3] = np.nan
+    with pytest.raises(ValueError):
+        CompiledForest.from_sklearn(model).predict_proba(X)
@@ -0,0 +1,80 @@
+"""The N costliest actionable rows per recommendation type, kept as data streams by.
+
+Rows are ranked by priority = Cost x Confidence / 100, the cost at stake
+weighted by how sure the model is. Each add() cuts every recommendation
+type in a chunk down to its N best rows with np.argpartition, an O(rows)
+partial selection rather than a sort. It then merges those with the N
+already kept and cuts again. Memory stays at N rows per type however many
+rows stream through, and TopRows from different chunks, processes or
+accounts merge the same way. Only the final N rows per type are sorted.
+"""
+import numpy as np
+import pandas as pd
+
+# Columns every kept row carries, before any passthrough identifiers
+TOP_COLUMNS = ['Service', 'InstanceType', 'Region', 'Cost', 'Confidence', 'Savings']
+
+
+def largest(priority, n):
+    """Indices of the n largest priorities, in no particular order."""
+    if len(priority) <= n:
+        return np.arange(len(priority))
+    return np.argpartition(priority, len(priority) - n)[-n:]
+
+
+class TopRows:
+    def __init__(self, n, columns=()):
+        self.n = n
+        self.columns = list(dict.fromkeys([*TOP_COLUMNS, *columns]))
+        self.rows = {}
+
+    def state(self):
+        return {
+            'n': self.n,
+            'columns': self.columns,
+            'rows': {rec_type: rows.to_dict('list') for rec_type, rows in self.rows.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        top = cls(state['n'], state['columns'])
+        top.rows = {rec_type: pd.DataFrame(rows) for rec_type, rows in state['rows'].items()}
+        return top
+
+    def add(self, df):
+        """Fold in a scored frame (Recommendation, Confidence and Savings set)."""
+        columns = [col for col in self.columns if col in df.columns]
+        priority = df['Cost'].to_numpy(dtype=np.float64) * df['Confidence'].to_numpy(dtype=np.float64) / 100
+        codes, rec_types = pd.factorize(df['Recommendation'])
+
+        for code, rec_type in enumerate(rec_types):
+            if rec_type == 'optimal':
+                continue
+            rows = np.flatnonzero(codes == code)
+            rows = rows[largest(priority[rows], self.n)]
+            kept = df.iloc[rows][columns].reset_index(drop=True)
+            for col in kept.columns:
+                if isinstance(kept[col].dtype, pd.CategoricalDtype):
+                    kept[col] = kept[col].astype(object)
+            self.keep(rec_type, kept.assign(Priority=priority[rows]))
+
+    def keep(self, rec_type, candidates):
+        current = self.rows.get(rec_type)
+        if current is not None:
+            candidates = pd.concat([current, candidates], ignore_index=True)
+        if len(candidates) > self.n:
+            candidates = candidates.iloc[largest(candidates['Priority'].to_numpy(), self.n)]
+        self.rows[rec_type] = candidates.reset_index(drop=True)
+
+    def merge(self, other):
+        for rec_type, rows in other.rows.items():
+            self.keep(rec_type, rows)
+
+    def to_response(self):
+        """{recommendation: [rows, highest priority first]}."""
+        response = {}
+        for rec_type, rows in self.rows.items():
+            rows = rows.sort_values(['Priority', 'Cost'], ascending=False, kind='stable')
+            rows = rows.round({'Cost': 2, 'Confidence': 1, 'Savings': 2, 'Priority': 2})
+            response[rec_type] = rows.astype(object).where(rows.notna(), None).to_dict('records')
+        return response
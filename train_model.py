@@ -2,45 +2,23 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, accuracy_score
+import argparse
 import joblib
 import json
 
-print("🚀 Starting ML Model Training...")
-
-# Load the data
-print("📊 Loading data...")
-df = pd.read_csv('aws_usage_data.csv')
-print(f"✅ Loaded {len(df)} rows")
-
-# Encode categorical variables
-print("🔧 Preprocessing data...")
-le_service = LabelEncoder()
-le_instance = LabelEncoder()
-le_region = LabelEncoder()
-
-df['Service_Encoded'] = le_service.fit_transform(df['Service'])
-df['InstanceType_Encoded'] = le_instance.fit_transform(df['InstanceType'])
-df['Region_Encoded'] = le_region.fit_transform(df['Region'])
+from feature_encoder import FeatureEncoder
+from hyperparameter_search import SEARCH_DIR, FeatureMatrix, parse_grid, search
+from imputation import ImputationStats
+from model_store import publish
+from streaming_training import train_streaming
 
 # Features for training
-features = ['Service_Encoded', 'InstanceType_Encoded', 'Region_Encoded', 
-            'Cost', 'CPUUtilization', 'MemoryUtilization', 
+FEATURES = ['Service_Encoded', 'InstanceType_Encoded', 'Region_Encoded',
+            'Cost', 'CPUUtilization', 'MemoryUtilization',
             'NetworkIO', 'StorageUsed', 'RunningHours']
 
-X = df[features]
-y = df['Recommendation']
-
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-print(f"📚 Training set: {len(X_train)} samples")
-print(f"🧪 Test set: {len(X_test)} samples")
-
-# Train Random Forest model
-print("\n🌲 Training Random Forest model...")
-model = RandomForestClassifier(
+MODEL_PARAMS = dict(
     n_estimators=100,
     max_depth=20,
     min_samples_split=5,
@@ -48,48 +26,180 @@ model = RandomForestClassifier(
     n_jobs=-1
 )
 
-model.fit(X_train, y_train)
-print("✅ Model trained!")
-
-# Evaluate
-print("\n📊 Evaluating model...")
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-
-print(f"\n🎯 Accuracy: {accuracy * 100:.2f}%")
-print("\n📋 Detailed Classification Report:")
-print(classification_report(y_test, y_pred))
-
-# Feature importance
-feature_importance = pd.DataFrame({
-    'feature': features,
-    'importance': model.feature_importances_
-}).sort_values('importance', ascending=False)
-
-print("\n🔍 Feature Importance:")
-print(feature_importance)
-
-# Save the model
-print("\n💾 Saving model and encoders...")
-joblib.dump(model, 'cost_optimizer_model.pkl')
-joblib.dump(le_service, 'le_service.pkl')
-joblib.dump(le_instance, 'le_instance.pkl')
-joblib.dump(le_region, 'le_region.pkl')
-
-# Save feature names for later use
-with open('model_features.json', 'w') as f:
-    json.dump(features, f)
-
-print("✅ Model saved as 'cost_optimizer_model.pkl'")
-print("✅ Encoders saved")
-print("\n🎉 Training complete!")
-
-# Test with a sample prediction
-print("\n🧪 Testing with sample prediction...")
-sample = X_test.iloc[0:1]
-prediction = model.predict(sample)
-probabilities = model.predict_proba(sample)
-
-print(f"Sample input: {sample.values[0]}")
-print(f"Prediction: {prediction[0]}")
-print(f"Confidence: {max(probabilities[0]) * 100:.2f}%")
\ No newline at end of file
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the cost optimization model.")
+    parser.add_argument('--data', default='aws_usage_data.csv')
+    parser.add_argument('--stream', action='store_true',
+                        help='train out of core in chunks and pick the model size by accuracy and latency')
+    parser.add_argument('--chunk-rows', type=int, default=500000)
+    parser.add_argument('--trees', default='10,25,50,100',
+                        help='comma-separated tree counts to sweep (--stream)')
+    parser.add_argument('--depths', default='8,12,16,20',
+                        help='comma-separated max depths to sweep (--stream)')
+    parser.add_argument('--accuracy-floor', type=float, default=0.95)
+    parser.add_argument('--latency-budget-us', type=float, default=20.0,
+                        help='per-row inference latency budget in microseconds')
+    parser.add_argument('--report', default='training_report.json')
+    parser.add_argument('--search', action='store_true',
+                        help='cross-validate a parameter grid in parallel, then train the best set')
+    parser.add_argument('--grid', nargs='*', metavar='NAME=V1,V2',
+                        help='parameter values to search, e.g. max_depth=12,20 n_estimators=50,100 (--search)')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='parallel fits (--search, default: one per core)')
+    parser.add_argument('--search-dir', default=SEARCH_DIR,
+                        help='where the encoded feature matrix and per-fold results are kept (--search)')
+    parser.add_argument('--search-report', default='search_report.json')
+    return parser.parse_args()
+
+
+def save_model(model, encoder, imputation):
+    print("\n💾 Saving model and encoder...")
+    joblib.dump(model, 'cost_optimizer_model.pkl')
+    encoder.save('feature_encoder.json')
+    imputation.save('imputation_table.json')
+
+    # Save feature names for later use
+    with open('model_features.json', 'w') as f:
+        json.dump(FEATURES, f)
+
+    # Publish the memory-mappable artifact the backend serves and hot-reloads
+    version = publish(model, encoder, FEATURES, imputation=imputation)
+
+    print("✅ Model saved as 'cost_optimizer_model.pkl'")
+    print("✅ Encoder saved as 'feature_encoder.json'")
+    print("✅ Imputation table saved as 'imputation_table.json'")
+    print(f"✅ Model version {version} published")
+
+
+def main_streaming(args):
+    print("🚀 Starting out-of-core ML Model Training...")
+    model, encoder, imputation, report = train_streaming(
+        args.data, FEATURES, MODEL_PARAMS,
+        tree_counts=[int(t) for t in args.trees.split(',')],
+        depths=[int(d) for d in args.depths.split(',')],
+        accuracy_floor=args.accuracy_floor,
+        latency_budget_us=args.latency_budget_us,
+        chunk_rows=args.chunk_rows,
+    )
+
+    selected = report['selected']
+    if not report['met_targets']:
+        print("\n⚠️  No model met both the accuracy floor and the latency budget")
+    print(f"\n🎯 Selected {selected['trees']} trees, depth {selected['max_depth']}: "
+          f"{selected['accuracy'] * 100:.2f}% accuracy, {selected['latency_us_per_row']:.2f} us/row, "
+          f"{selected['artifact_bytes'] / 1e6:.1f} MB")
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📋 Sweep report written to {args.report}")
+
+    save_model(model, encoder, imputation)
+    print("\n🎉 Training complete!")
+
+
+def main_search(args):
+    print("🚀 Starting cross-validated parameter search...")
+    matrix = FeatureMatrix.build(args.data, FEATURES, root=args.search_dir, chunk_rows=args.chunk_rows)
+    base_params = {name: value for name, value in MODEL_PARAMS.items() if name != 'n_jobs'}
+    report = search(matrix, base_params, parse_grid(args.grid), k=args.folds, workers=args.workers,
+                    seed=MODEL_PARAMS['random_state'])
+
+    print(f"\n📋 Ranked by {args.folds}-fold accuracy ({report['fits_run']} fits run, "
+          f"{report['fits_cached']} cached, {report['seconds']:.1f}s):")
+    for candidate in report['ranked']:
+        tuned = {name: candidate['params'][name] for name in report['grid']}
+        print(f"   {candidate['rank']:>3}. {candidate['accuracy_mean'] * 100:6.2f}% "
+              f"± {candidate['accuracy_std'] * 100:.2f}  fit {candidate['fit_seconds_mean']:7.1f}s"
+              f"{'  *' if candidate['pareto'] else '   '} {tuned}")
+    print("   (* no other set is both more accurate and faster to fit)")
+
+    with open(args.search_report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📋 Search report written to {args.search_report}")
+
+    # Refit the winner on every row, using all cores again
+    params = {**report['best']['params'], 'n_jobs': MODEL_PARAMS['n_jobs']}
+    print(f"\n🌲 Training the best parameters on all {matrix.rows} rows: {params}")
+    X = pd.DataFrame(matrix.X(), columns=FEATURES)
+    model = RandomForestClassifier(**params).fit(X, matrix.classes[matrix.y()])
+    save_model(model, matrix.encoder(), matrix.imputation())
+    print("\n🎉 Training complete!")
+
+
+def main():
+    args = parse_args()
+    if args.stream:
+        main_streaming(args)
+        return
+    if args.search:
+        main_search(args)
+        return
+
+    print("🚀 Starting ML Model Training...")
+
+    # Load the data
+    print("📊 Loading data...")
+    df = pd.read_csv(args.data)
+    print(f"✅ Loaded {len(df)} rows")
+
+    # Encode categorical variables
+    print("🔧 Preprocessing data...")
+    encoder = FeatureEncoder.fit(df)
+    encoder.encode(df)
+
+    # Means the backend imputes missing usage metrics with
+    imputation = ImputationStats(encoder.classes['Service'], encoder.classes['InstanceType']).add(df).table()
+
+    X = df[FEATURES]
+    y = df['Recommendation']
+
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    print(f"📚 Training set: {len(X_train)} samples")
+    print(f"🧪 Test set: {len(X_test)} samples")
+
+    # Train Random Forest model
+    print("\n🌲 Training Random Forest model...")
+    model = RandomForestClassifier(**MODEL_PARAMS)
+
+    model.fit(X_train, y_train)
+    print("✅ Model trained!")
+
+    # Evaluate
+    print("\n📊 Evaluating model...")
+    y_pred = model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+
+    print(f"\n🎯 Accuracy: {accuracy * 100:.2f}%")
+    print("\n📋 Detailed Classification Report:")
+    print(classification_report(y_test, y_pred))
+
+    # Feature importance
+    feature_importance = pd.DataFrame({
+        'feature': FEATURES,
+        'importance': model.feature_importances_
+    }).sort_values('importance', ascending=False)
+
+    print("\n🔍 Feature Importance:")
+    print(feature_importance)
+
+    # Save the model
+    save_model(model, encoder, imputation)
+    print("\n🎉 Training complete!")
+
+    # Test with a sample prediction
+    print("\n🧪 Testing with sample prediction...")
+    sample = X_test.iloc[0:1]
+    prediction = model.predict(sample)
+    probabilities = model.predict_proba(sample)
+
+    print(f"Sample input: {sample.values[0]}")
+    print(f"Prediction: {prediction[0]}")
+    print(f"Confidence: {max(probabilities[0]) * 100:.2f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""Dense date-bucketed index of cost, savings and row counts.
+
+One float64 array holds every day of the data:
+
+    cells[day, service, region, recommendation] = (cost, savings, rows)
+
+add() folds a scored frame in with one np.bincount per measure. The
+bincount runs over the cells of the frame's own day range only, so the cost
+follows the frame, not the index. A frame and the same frame split into
+chunks give the same index. The day axis grows to cover new dates, and the
+label axes grow as new services, regions or recommendations appear.
+
+The array is dense over days, so the dates it accepts are bounded. Neither
+bound depends on how the rows were split into frames:
+
+- Dates before TREND_FIRST_DATE, or more than TREND_FUTURE_DAYS after
+  today, are treated as typos. They are counted in `out_of_range` and
+  left out.
+- The index keeps the latest TREND_MAX_DAYS days. Rows older than that
+  are counted in `expired_rows`, whether they were dropped on arrival or
+  when newer days arrived later.
+
+query() answers trend and range questions such as "savings by month for EC2
+in eu-west-1" from the array alone. It slices a label, takes a day range,
+sums the remaining axes and, for months, calls np.add.reduceat on the
+month boundaries. The work depends on the index size (days x labels),
+never on how many rows were folded in.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# Rows dated before this (AWS billing didn't exist yet) are left out
+TREND_FIRST_DATE = np.datetime64(os.environ.get('TREND_FIRST_DATE', '2006-01-01'), 'D')
+
+# Rows dated more than this many days after today are left out
+TREND_FUTURE_DAYS = int(os.environ.get('TREND_FUTURE_DAYS', 31))
+
+# Days an index covers at most; the oldest are dropped beyond that
+TREND_MAX_DAYS = int(os.environ.get('TREND_MAX_DAYS', 731))
+
+# Most recent days returned in the `daily` series of a response
+TREND_DAILY_MAX = 366
+
+MEASURES = ['cost', 'savings', 'rows']
+
+# Label axes in cell order, keyed by their query name
+AXES = {'service': 'Service', 'region': 'Region', 'recommendation': 'Recommendation'}
+
+GRANULARITIES = ['day', 'month']
+
+UNKNOWN_KEY = 'unknown'
+
+
+class TrendIndex:
+    def __init__(self):
+        self.origin = None
+        self.labels = {axis: [] for axis in AXES}
+        self.positions = {axis: {} for axis in AXES}
+        self.cells = np.zeros((0, 0, 0, 0, len(MEASURES)))
+        self.undated = 0
+        self.out_of_range = 0
+        self.expired_rows = 0
+
+    @property
+    def rows(self):
+        return int(self.cells[..., 2].sum())
+
+    def state(self):
+        days, s, r, k = np.nonzero(self.cells[..., 2])
+        values = self.cells[days, s, r, k]
+        return {
+            'origin': None if self.origin is None else str(self.origin),
+            'labels': self.labels,
+            'cells': {'day': days.tolist(), 'service': s.tolist(), 'region': r.tolist(),
+                      'recommendation': k.tolist(),
+                      **{measure: values[:, i].tolist() for i, measure in enumerate(MEASURES)}},
+            'undated': self.undated,
+            'out_of_range': self.out_of_range,
+            'expired_rows': self.expired_rows,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls()
+        cells = state['cells']
+        if state['origin'] is not None and cells['day']:
+            origin = np.datetime64(state['origin'], 'D')
+            labels = {axis: np.array(state['labels'][axis], dtype=object) for axis in AXES}
+            values = np.column_stack([cells[measure] for measure in MEASURES])
+            index.fold(origin + np.array(cells['day']),
+                       *(labels[axis][cells[axis]] for axis in AXES), values)
+        index.undated = state['undated']
+        index.out_of_range = state.get('out_of_range', 0)
+        index.expired_rows = state.get('expired_rows', 0)
+        return index
+
+    def codes(self, axis, values):
+        """Positions of `values` on a label axis, appending labels not seen before."""
+        inverse, uniques = pd.factorize(pd.Series(values, dtype=object).fillna(UNKNOWN_KEY))
+        positions = self.positions[axis]
+        for label in uniques:
+            if label not in positions:
+                positions[label] = len(self.labels[axis])
+                self.labels[axis].append(label)
+        return np.array([positions[label] for label in uniques], dtype=np.int64)[inverse]
+
+    def day(self, date):
+        """Offset of a date from the first indexed day."""
+        return int((np.datetime64(date, 'D') - self.origin).astype(np.int64))
+
+    def grow(self, first, last):
+        """Extend the cell array to cover days first..last and every known label."""
+        if self.origin is None:
+            self.origin = first
+        before = max(0, -self.day(first))
+        self.origin -= before
+        days = max(before + len(self.cells), self.day(last) + 1)
+        pad = [(before, days - before - len(self.cells))]
+        pad += [(0, len(self.labels[axis]) - size) for axis, size in zip(AXES, self.cells.shape[1:4])]
+        pad += [(0, 0)]
+        if any(p != (0, 0) for p in pad):
+            self.cells = np.pad(self.cells, pad)
+
+    def expire(self, floor):
+        """Drop the days before `floor`."""
+        cut = self.day(floor)
+        if cut > 0:
+            self.expired_rows += int(self.cells[:cut, ..., 2].sum())
+            self.cells = self.cells[cut:].copy()
+            self.origin = floor
+
+    def fold(self, dates, services, regions, recommendations, values):
+        """Add `values` (rows x MEASURES) at the given dates and labels."""
+        # Keep the latest TREND_MAX_DAYS days, counting these rows too
+        last = dates.max() if self.origin is None else max(dates.max(), self.origin + len(self.cells) - 1)
+        floor = last - (TREND_MAX_DAYS - 1)
+        recent = dates >= floor
+        if not recent.all():
+            self.expired_rows += int(values[~recent, 2].sum())
+            dates, values = dates[recent], values[recent]
+            services, regions, recommendations = services[recent], regions[recent], recommendations[recent]
+            if not len(dates):
+                return
+        if self.origin is not None:
+            self.expire(floor)
+
+        codes = [self.codes(axis, labels) for axis, labels in
+                 zip(AXES, (services, regions, recommendations))]
+        first, last = dates.min(), dates.max()
+        self.grow(first, last)
+
+        # Only the chunk's own day range is touched, so the work follows the chunk
+        block = self.cells[self.day(first):self.day(last) + 1]
+        shape = block.shape[:4]
+        flat = np.ravel_multi_index(((dates - first).astype(np.int64), *codes), shape)
+        for i in range(len(MEASURES)):
+            block[..., i] += np.bincount(flat, weights=values[:, i], minlength=int(np.prod(shape))).reshape(shape)
+
+    def add(self, df):
+        """Fold in a scored frame with Date, Service, Region, Recommendation, Cost and Savings."""
+        dates = pd.to_datetime(df['Date'], errors='coerce').to_numpy()
+        dated = ~np.isnat(dates)
+        self.undated += int((~dated).sum())
+        if not dated.any():
+            return
+        days = dates[dated].astype('datetime64[D]')
+
+        # Dates outside any billing period are typos, not history
+        plausible = (days >= TREND_FIRST_DATE) & (days <= np.datetime64('today', 'D') + TREND_FUTURE_DAYS)
+        self.out_of_range += int((~plausible).sum())
+        keep = np.flatnonzero(dated)[plausible]
+
+        values = np.column_stack([
+            df['Cost'].to_numpy(dtype=np.float64)[keep],
+            df['Savings'].to_numpy(dtype=np.float64)[keep],
+            np.ones(len(keep)),
+        ])
+        self.fold(days[plausible], *(df[column].to_numpy()[keep] for column in AXES.values()), values)
+
+    def merge(self, other):
+        days, s, r, k = np.nonzero(other.cells[..., 2])
+        if len(days):
+            labels = {axis: np.array(other.labels[axis], dtype=object) for axis in AXES}
+            self.fold(other.origin + days, labels['service'][s], labels['region'][r],
+                      labels['recommendation'][k], other.cells[days, s, r, k])
+        self.undated += other.undated
+        self.out_of_range += other.out_of_range
+        self.expired_rows += other.expired_rows
+
+    def query(self, granularity='month', start=None, end=None, by=None, **filters):
+        """Cost, savings and rows per day or month between `start` and `end` (inclusive).
+
+        `filters` pick one service, region and/or recommendation. `by` names
+        an axis to split the series on. Returns a list of periods, or with
+        `by` a dict of them keyed by label.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}', expected one of {GRANULARITIES}")
+        unknown = [axis for axis in [*filters, *([by] if by else [])] if axis not in AXES]
+        if unknown:
+            raise ValueError(f"Unknown trend axes {unknown}, expected any of {list(AXES)}")
+        if by is not None and filters.get(by) is not None:
+            raise ValueError(f"Can't both filter and split on {by}")
+
+        empty = {} if by else []
+        if self.origin is None:
+            return empty
+        cells = self.cells
+        for position, axis in enumerate(AXES, 1):
+            value = filters.get(axis)
+            if value is None:
+                continue
+            i = self.positions[axis].get(value)
+            if i is None:
+                return empty
+            # A one-wide slice is a view, so nothing is copied
+            cells = cells[(slice(None),) * position + (slice(i, i + 1),)]
+
+        # Day range, clipped to the data
+        first = 0 if start is None else max(self.day(start), 0)
+        last = len(cells) if end is None else min(self.day(end) + 1, len(cells))
+        if first >= last:
+            return empty
+        cells = cells[first:last]
+
+        keep = list(AXES).index(by) + 1 if by else None
+        totals = cells.sum(axis=tuple(a for a in (1, 2, 3) if a != keep))
+
+        dates = self.origin + np.arange(first, last)
+        if granularity == 'month':
+            months = dates.astype('datetime64[M]')
+            starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+            totals = np.add.reduceat(totals, starts, axis=0)
+            periods = [str(month) for month in months[starts]]
+        else:
+            periods = [str(day) for day in dates]
+
+        if by is None:
+            return series(periods, totals)
+        return {label: series(periods, totals[:, i])
+                for i, label in enumerate(self.labels[by]) if totals[:, i, 2].any()}
+
+    def to_response(self):
+        """Monthly totals over everything indexed, daily totals over the latest TREND_DAILY_MAX days."""
+        days = np.flatnonzero(self.cells[..., 2].any(axis=(1, 2, 3)))
+        last = self.origin + days[-1] if len(days) else None
+        return {
+            'first_date': str(self.origin + days[0]) if len(days) else None,
+            'last_date': None if last is None else str(last),
+            'undated_rows': self.undated,
+            'out_of_range_rows': self.out_of_range,
+            'expired_rows': self.expired_rows,
+            'monthly': self.query('month'),
+            'daily': [] if last is None else self.query('day', start=last - (TREND_DAILY_MAX - 1)),
+        }
+
+
+def series(periods, totals):
+    return [{'period': period, 'cost': round(float(cost), 2), 'savings': round(float(savings), 2),
+             'rows': int(rows)}
+            for period, (cost, savings, rows) in zip(periods, totals)]
@@ -0,0 +1,216 @@
+"""Reads uploaded usage reports in CSV, compressed CSV, Parquet or Arrow IPC.
+
+Only the columns the caller asks for are parsed, each with a compact dtype:
+categories for the string columns the encoder maps and float64 for the
+numbers. The model's inputs are cast to float32 only when its feature
+matrix is built, so exported rows keep the values as uploaded.
+
+estimate_rows() and frame_bytes_per_row() size an upload before it is parsed,
+so callers can keep a request within a memory budget. With `chunksize` every
+format yields frames of at most that many rows, however the file was written.
+
+Given a path, CSV, Parquet and Arrow files are memory-mapped rather than
+read into Python buffers.
+"""
+import gzip
+import os
+
+import pandas as pd
+
+# Upload formats keyed by file suffix, longest first so .csv.gz wins over .gz
+FORMAT_SUFFIXES = [
+    ('.csv.gz', 'csv.gz'), ('.csv.gzip', 'csv.gz'),
+    ('.csv.zst', 'csv.zst'), ('.csv.zstd', 'csv.zst'),
+    ('.parquet', 'parquet'), ('.pq', 'parquet'),
+    ('.arrow', 'arrow'), ('.feather', 'arrow'), ('.ipc', 'arrow'),
+    ('.gz', 'csv.gz'), ('.zst', 'csv.zst'),
+    ('.csv', 'csv'),
+]
+FORMATS = sorted(set(fmt for _, fmt in FORMAT_SUFFIXES))
+
+CSV_COMPRESSION = {'csv': None, 'csv.gz': 'gzip', 'csv.zst': 'zstd'}
+
+COLUMN_DTYPES = {
+    'Service': 'category',
+    'Region': 'category',
+    'InstanceType': 'category',
+    'Cost': 'float64',
+    'CPUUtilization': 'float64',
+    'MemoryUtilization': 'float64',
+    'NetworkIO': 'float64',
+    'StorageUsed': 'float64',
+    'RunningHours': 'float64',
+}
+
+ENCODED_SUFFIX = '_Encoded'
+
+# In-memory bytes per value for each compact dtype. Categories hold small
+# integer codes; other columns (Date, passthrough ids) are Python strings.
+DTYPE_BYTES = {'category': 2, 'float32': 4, 'float64': 8}
+OBJECT_BYTES = 64
+
+# Decompressed bytes read from the start of a CSV to measure its line length
+SAMPLE_BYTES = 64 * 1024
+
+# Compressed CSVs don't store their decompressed size, so they are counted
+# by decompressing this much at a time
+COUNT_BLOCK_BYTES = 1 << 20
+
+COMPRESSED_CSV_FORMATS = [fmt for fmt, compression in CSV_COMPRESSION.items() if compression]
+
+
+def input_columns(features, extra=()):
+    """Raw upload columns behind a model feature list, plus `extra`."""
+    columns = [f[:-len(ENCODED_SUFFIX)] if f.endswith(ENCODED_SUFFIX) else f for f in features]
+    return list(dict.fromkeys(['Service', 'Region', 'InstanceType', 'Cost', *columns, *extra]))
+
+
+def detect_format(filename, requested=None):
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unsupported format '{requested}', expected one of {FORMATS}")
+        return requested
+    name = (filename or '').lower()
+    for suffix, fmt in FORMAT_SUFFIXES:
+        if name.endswith(suffix):
+            return fmt
+    return 'csv'
+
+
+def frame_bytes_per_row(columns):
+    """Approximate in-memory bytes per row of a compact frame with `columns`."""
+    return sum(DTYPE_BYTES.get(COLUMN_DTYPES.get(col), OBJECT_BYTES) for col in columns)
+
+
+def decompressed(source, fmt):
+    """Readable stream of a compressed CSV's decompressed bytes."""
+    if fmt == 'csv.gz':
+        return gzip.GzipFile(fileobj=source)
+    import zstandard
+
+    return zstandard.ZstdDecompressor().stream_reader(source)
+
+
+def arrow_rows(source):
+    """Exact row count of an Arrow IPC file or stream, from its record batch headers."""
+    import pyarrow as pa
+
+    try:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return sum(batch.num_rows for batch in pa.ipc.open_stream(source))
+
+
+def estimate_rows(source, fmt, columns):
+    """Estimate an upload's row count without parsing it.
+
+    Exact for Parquet (from the footer), Arrow (from the record batch
+    headers) and compressed CSV (from its lines, decompressed in blocks
+    without parsing). Plain CSV row counts come from the line length of a
+    sample.
+    `source` is a path or a seekable file; a file is left where it was.
+    """
+    if isinstance(source, str):
+        if fmt == 'arrow':
+            import pyarrow as pa
+
+            # Mapped, so counting batches never copies their buffers
+            with pa.memory_map(source) as mapped:
+                return arrow_rows(mapped)
+        with open(source, 'rb') as f:
+            return estimate_rows(f, fmt, columns)
+
+    position = source.tell()
+    try:
+        size = source.seek(0, os.SEEK_END)
+        source.seek(0)
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+
+            return pq.ParquetFile(source).metadata.num_rows
+        if fmt == 'arrow':
+            return arrow_rows(source)
+
+        if fmt in COMPRESSED_CSV_FORMATS:
+            stream = decompressed(source, fmt)
+            return max(sum(block.count(b'\n') for block in iter(lambda: stream.read(COUNT_BLOCK_BYTES), b'')), 1)
+
+        sample = source.read(SAMPLE_BYTES)
+        lines = sample.count(b'\n')
+        if len(sample) < SAMPLE_BYTES:
+            return max(lines, 1)
+        return int(size * lines / len(sample))
+    finally:
+        source.seek(position)
+
+
+def compact(df):
+    dtypes = {col: COLUMN_DTYPES[col] for col in df.columns if col in COLUMN_DTYPES}
+    return df.astype(dtypes, copy=False)
+
+
+def read_upload(source, fmt, columns, chunksize=None):
+    """Read `columns` (those present) from an upload.
+
+    Returns a DataFrame, or with `chunksize` an iterator of DataFrames of
+    about that many rows.
+    """
+    wanted = set(columns)
+    if fmt in CSV_COMPRESSION:
+        reader = pd.read_csv(
+            source,
+            usecols=lambda col: col in wanted,
+            dtype={col: dtype for col, dtype in COLUMN_DTYPES.items() if col in wanted},
+            compression=CSV_COMPRESSION[fmt],
+            # Compressed files are decompressed into buffers either way
+            memory_map=isinstance(source, str) and fmt == 'csv',
+            chunksize=chunksize,
+        )
+        return reader if chunksize is None else read_csv_chunks(reader)
+    if fmt == 'parquet':
+        return read_parquet(source, wanted, chunksize)
+    if fmt == 'arrow':
+        return read_arrow(source, wanted, chunksize)
+    raise ValueError(f"Unsupported format '{fmt}', expected one of {FORMATS}")
+
+
+def read_csv_chunks(reader):
+    with reader:
+        yield from reader
+
+
+def read_parquet(source, wanted, chunksize):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source, memory_map=isinstance(source, str))
+    present = [col for col in parquet_file.schema_arrow.names if col in wanted]
+    if chunksize is None:
+        return compact(parquet_file.read(columns=present).to_pandas())
+    return (compact(batch.to_pandas())
+            for batch in parquet_file.iter_batches(batch_size=chunksize, columns=present))
+
+
+def read_arrow(source, wanted, chunksize):
+    import pyarrow as pa
+
+    if isinstance(source, str):
+        source = pa.memory_map(source)
+
+    # Arrow IPC file (random access, also Feather v2) or IPC stream
+    try:
+        reader = pa.ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        batches = iter(reader)
+    present = [col for col in reader.schema.names if col in wanted]
+
+    if chunksize is None:
+        table = pa.Table.from_batches(list(batches), schema=reader.schema).select(present)
+        return compact(table.to_pandas())
+    # A file written as one large batch is sliced (zero-copy) to the chunk size
+    return (compact(pa.Table.from_batches([batch.slice(offset, chunksize)]).select(present).to_pandas())
+            for batch in batches for offset in range(0, batch.num_rows, chunksize))
@@ -0,0 +1,61 @@
+"""Spools uploaded files to disk as they arrive and maps them for parsing.
+
+Flask's request class is swapped for SpoolingRequest, which writes every
+multipart file part straight into a named temporary file under UPLOAD_DIR.
+The upload is therefore never held in worker memory, whatever its size.
+Handlers get the file's path from upload_path(). Parsers then memory-map it
+(pandas memory_map, pyarrow memory_map), and mapped() hashes it in place.
+The OS pages the bytes in on demand and nothing is copied into Python
+objects.
+
+The app's MAX_CONTENT_LENGTH is set from MAX_UPLOAD_MB. Request bodies over
+it get a 413 before any of the body is read. See reject_oversized().
+"""
+import contextlib
+import mmap
+import os
+import tempfile
+
+from flask import Request
+
+# Largest request body accepted, in MB; larger uploads get a 413 straight away
+MAX_UPLOAD_MB = int(os.environ.get('MAX_UPLOAD_MB', 1024))
+
+# Directory uploads are spooled to while a request is handled (default: system temp)
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR') or None
+
+
+class SpoolingRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Deleted when werkzeug closes the request's files at the end of the request
+        return tempfile.NamedTemporaryFile('wb+', dir=UPLOAD_DIR, prefix='infratrim-upload-')
+
+
+def reject_oversized(request):
+    """Error message if the declared body size is over the limit, else None.
+
+    Checked before the body is read, so an oversized upload fails fast. Bodies
+    sent without a Content-Length are cut off by werkzeug once they pass the
+    limit, which raises RequestEntityTooLarge.
+    """
+    limit = request.max_content_length
+    if limit is not None and request.content_length is not None and request.content_length > limit:
+        return f"Upload of {request.content_length / 1e6:.0f} MB exceeds the {MAX_UPLOAD_MB} MB limit"
+    return None
+
+
+def upload_path(upload):
+    """Path of a spooled werkzeug FileStorage, flushed so it can be reopened."""
+    upload.stream.flush()
+    return upload.stream.name
+
+
+@contextlib.contextmanager
+def mapped(path):
+    """Read-only memory map of a file. Empty files map to b'' (mmap rejects them)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            yield mapping
@@ -0,0 +1,251 @@
+"""On-disk store of scored usage rows, partitioned by Date, with running rollups.
+
+    usage_store/
+      rollup.json                      <- aggregate state + date range
+      pending.json                     <- only while an append is being written
+      Date=2024-01-01/
+        rows.csv                       <- scored rows for that day
+        keys.npy                       <- uint64 key of every stored row
+
+Appending a daily export keys each input row, skips rows already stored in
+their day's partition, scores only the new ones and folds them into the
+rollup. Reading the current totals loads rollup.json alone, however much
+history is stored.
+
+A row's key hashes its Date plus the caller's key columns (a resource or
+line item id), or every input column when there are none. Values are
+normalized first (numbers to float64 rounded to KEY_DECIMALS, everything
+else to str), so the same row gets the same key whatever dtypes it was read
+with.
+
+Replacing rollup.json commits an append. pending.json records each touched
+partition's size beforehand, and an append interrupted before its rollup
+was saved is rolled back under the next lock.
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+USAGE_STORE_DIR = os.environ.get('USAGE_STORE_DIR', 'usage_store')
+
+ROLLUP_FILE = 'rollup.json'
+JOURNAL_FILE = 'pending.json'
+ROWS_FILE = 'rows.csv'
+KEYS_FILE = 'keys.npy'
+LOCK_FILE = '.lock'
+
+# Decimal places numbers are rounded to before keying, so float32 and float64 reads agree
+KEY_DECIMALS = 6
+
+
+def row_keys(df, columns):
+    """uint64 key per row of df from `columns`, the same whatever dtypes they were read with."""
+    normalized = {}
+    for col in columns:
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            normalized[col] = values.to_numpy(dtype=np.float64).round(KEY_DECIMALS)
+        else:
+            normalized[col] = values.astype(object).where(values.notna(), None).astype(str).to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).to_numpy()
+
+
+class UsageStore:
+    """Date-partitioned scored rows plus an incrementally updated aggregate.
+
+    `aggregate_cls` is the rollup type; it needs add(df), state() and
+    from_state(state). `columns` are the scored columns written to partitions.
+    """
+
+    def __init__(self, aggregate_cls, columns, root=USAGE_STORE_DIR):
+        self.aggregate_cls = aggregate_cls
+        self.columns = columns
+        self.root = root
+        self.lock = threading.Lock()
+        self.loaded = (None, None)
+
+    @contextmanager
+    def locked(self):
+        # Serializes appends across gunicorn workers
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_FILE), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def partition_dir(self, date):
+        return os.path.join(self.root, f'Date={date}')
+
+    def load_keys(self, date, columns):
+        """Keys of the rows stored for `date`.
+
+        Partitions written before keys.npy existed are keyed from their rows,
+        when they hold every key column.
+        """
+        part_dir = self.partition_dir(date)
+        path = os.path.join(part_dir, KEYS_FILE)
+        if os.path.exists(path):
+            return np.load(path)
+        rows_path = os.path.join(part_dir, ROWS_FILE)
+        if os.path.exists(rows_path) and set(columns) <= set(pd.read_csv(rows_path, nrows=0).columns):
+            return row_keys(pd.read_csv(rows_path, usecols=columns), columns)
+        return np.empty(0, dtype=np.uint64)
+
+    def save_keys(self, date, keys):
+        path = os.path.join(self.partition_dir(date), KEYS_FILE)
+        tmp = f'{path}.tmp.npy'
+        np.save(tmp, keys)
+        os.replace(tmp, path)
+
+    def recover(self):
+        """Roll back an append that stopped before its rollup was saved. Caller holds the lock."""
+        path = os.path.join(self.root, JOURNAL_FILE)
+        try:
+            with open(path) as f:
+                journal = json.load(f)
+        except FileNotFoundError:
+            return
+        if self.load_rollup()[1].get('generation', 0) != journal['generation']:
+            for date, (size, keys) in journal['partitions'].items():
+                part_dir = self.partition_dir(date)
+                if not size:
+                    shutil.rmtree(part_dir, ignore_errors=True)
+                    continue
+                os.truncate(os.path.join(part_dir, ROWS_FILE), size)
+                keys_path = os.path.join(part_dir, KEYS_FILE)
+                if keys is None:
+                    # Keyed from its rows again on the next append
+                    if os.path.exists(keys_path):
+                        os.remove(keys_path)
+                else:
+                    self.save_keys(date, np.load(keys_path)[:keys])
+            print(f"⚠️  Rolled back an interrupted append to {len(journal['partitions'])} partitions")
+        os.remove(path)
+
+    def begin(self, generation, dates):
+        """Record the touched partitions' sizes before an append writes to them."""
+        partitions = {}
+        for date in dates:
+            part_dir = self.partition_dir(date)
+            rows_path = os.path.join(part_dir, ROWS_FILE)
+            keys_path = os.path.join(part_dir, KEYS_FILE)
+            partitions[date] = [
+                os.path.getsize(rows_path) if os.path.exists(rows_path) else 0,
+                len(np.load(keys_path, mmap_mode='r')) if os.path.exists(keys_path) else None,
+            ]
+        path = os.path.join(self.root, JOURNAL_FILE)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'generation': generation, 'partitions': partitions}, f)
+        os.replace(tmp, path)
+
+    def load_rollup(self):
+        """Return (aggregate, meta) for everything stored so far."""
+        try:
+            with open(os.path.join(self.root, ROLLUP_FILE)) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self.aggregate_cls(), {'partitions': 0, 'first_date': None, 'last_date': None, 'generation': 0}
+        return self.aggregate_cls.from_state(data['aggregate']), data['meta']
+
+    def save_rollup(self, aggregate, meta):
+        path = os.path.join(self.root, ROLLUP_FILE)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'aggregate': aggregate.state(), 'meta': meta}, f)
+        os.replace(tmp, path)
+
+    def append(self, df, score, key=()):
+        """Score and store the rows of df not already stored.
+
+        `score(df)` must return df with the model's Recommendation and
+        Confidence columns added. `key` names the columns that identify a row
+        within its day, such as a resource or line item id; without it every
+        column does. Returns (appended, skipped, aggregate, meta).
+        """
+        dates = pd.to_datetime(df['Date'], errors='coerce')
+        if dates.isna().any():
+            raise ValueError("Date column has missing or unparseable values")
+        df['Date'] = dates.dt.strftime('%Y-%m-%d')
+
+        # Key the input as uploaded, before scoring adds columns
+        key_columns = ['Date', *key] if key else sorted(df.columns)
+        keys = row_keys(df, key_columns)
+        first_seen = ~pd.Series(keys).duplicated().to_numpy()
+
+        with self.locked():
+            self.recover()
+            aggregate, meta = self.load_rollup()
+            fresh = np.zeros(len(df), dtype=bool)
+            stored = {}
+            for date, idx in df.groupby('Date').indices.items():
+                stored[date] = self.load_keys(date, key_columns)
+                fresh[idx] = first_seen[idx] & ~np.isin(keys[idx], stored[date])
+
+            appended = int(fresh.sum())
+            if appended:
+                scored = score(df[fresh].copy())
+                fresh_keys = keys[fresh]
+                aggregate.add(scored)
+                meta['generation'] = meta.get('generation', 0) + 1
+                by_date = scored.groupby('Date').indices
+
+                # Partitions first, then the rollup; an interruption in between is rolled back
+                self.begin(meta['generation'], list(by_date))
+                for date, idx in by_date.items():
+                    part_dir = self.partition_dir(date)
+                    os.makedirs(part_dir, exist_ok=True)
+                    rows_path = os.path.join(part_dir, ROWS_FILE)
+                    new_partition = not os.path.exists(rows_path)
+                    scored.iloc[idx].to_csv(rows_path, mode='a', index=False, columns=self.columns,
+                                            header=new_partition)
+                    if new_partition:
+                        meta['partitions'] += 1
+                    self.save_keys(date, np.concatenate([stored[date], fresh_keys[idx]]))
+
+                batch_first, batch_last = scored['Date'].min(), scored['Date'].max()
+                meta['first_date'] = min(filter(None, [meta['first_date'], batch_first]))
+                meta['last_date'] = max(filter(None, [meta['last_date'], batch_last]))
+                self.save_rollup(aggregate, meta)
+                os.remove(os.path.join(self.root, JOURNAL_FILE))
+
+        return appended, len(df) - appended, aggregate, meta
+
+    def summary(self):
+        """(aggregate, meta) for everything stored, reloaded only when rollup.json changes.
+
+        The result is shared between requests, so callers must not modify it.
+        """
+        try:
+            mtime = os.stat(os.path.join(self.root, ROLLUP_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self.lock:
+            loaded_mtime, rollup = self.loaded
+            if rollup is None or loaded_mtime != mtime:
+                rollup = self.load_rollup()
+                self.loaded = (mtime, rollup)
+        return rollup
+
+    def rebuild(self):
+        """Recompute the rollup from the stored rows, e.g. after the rollup type gained a field.
+
+        Rows keep their stored scores; nothing is rescored. Returns (aggregate, meta).
+        """
+        with self.locked():
+            self.recover()
+            aggregate, meta = self.aggregate_cls(), self.load_rollup()[1]
+            for name in sorted(os.listdir(self.root)):
+                rows_path = os.path.join(self.root, name, ROWS_FILE)
+                if name.startswith('Date=') and os.path.exists(rows_path):
+                    aggregate.add(pd.read_csv(rows_path))
+            self.save_rollup(aggregate, meta)
+        return aggregate, meta